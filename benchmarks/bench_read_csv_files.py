@@ -0,0 +1,66 @@
+import os
+import sys
+import glob
+import time
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import data_processing as dp
+
+def legacy_read_csv_files(files):
+    '''
+    The previous loader, concatenates once per file and infers the types
+    
+    Args:
+        files (str): all the files that matches the string will be read
+
+    Returns:
+        The dataframe contains all data from read CSV files
+    '''
+    assert(isinstance(files, str))
+    all_data = pd.DataFrame()
+    for f in sorted(glob.glob(files)):
+        df = pd.read_csv(f)
+        all_data = pd.concat([all_data, df])
+    return all_data
+
+def measure(func, *args, **kwargs):
+    '''
+    Run a function twice, once for the wall time and once traced for the peak memory
+    
+    Args:
+        func (callable): the function to run
+
+    Returns:
+        Wall time in seconds, peak traced memory in MB and the result of the function
+    '''
+    assert(callable(func))
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    wall = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return wall, peak / 1e6, result
+
+def main():
+    '''
+    Compare the legacy and the schema based loader on the 2003-2020 match files
+    '''
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    files = "data/atp_matches*.csv"
+    runs = [
+        ('legacy', legacy_read_csv_files, {}),
+        ('schema', dp.read_csv_files, {'use_cache': False}),
+        ('schema usecols', dp.read_csv_files, {'use_cache': False, 'usecols': dp.GSLAM_COLUMNS}),
+        ]
+    print('%-16s %10s %12s %12s' % ('loader', 'wall (s)', 'peak (MB)', 'frame (MB)'))
+    for name, func, kwargs in runs:
+        wall, peak, data = measure(func, files, **kwargs)
+        size = data.memory_usage(deep=True).sum() / 1e6
+        print('%-16s %10.3f %12.1f %12.1f' % (name, wall, peak, size))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import data_processing as dp
+
+def legacy_remove_player(player_list, data, status):
+    '''
+    The previous implementation, one eval and regex scan per player
+    
+    Args:
+        player_list (list(str)): the list of given players
+        data (pd.DataFrame): data of all matches
+        status (str): indicates whether the won or lost games to be remove
+
+    Returns:
+        The dataframe contains the remaining data
+    '''
+    assert(isinstance(player_list, list))
+    assert(isinstance(data, pd.DataFrame))
+    assert(isinstance(status, str))
+    data_other  = data.copy()
+    for player in player_list:
+        data_other = data_other[~eval('data_other.'+status+'_name.str.contains(\''+player+'\')')]
+    return data_other
+
+def timed(func, *args, **kwargs):
+    '''
+    Run a function once and measure its wall time
+    
+    Args:
+        func (callable): the function to run
+
+    Returns:
+        Wall time in seconds and the result of the function
+    '''
+    assert(callable(func))
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def main():
+    '''
+    Compare the legacy and the set based remove_player on all 2003-2020 matches
+    '''
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    data = dp.read_csv_files("data/atp_matches*.csv")
+    data_object = dp.analysis_dtypes(data)
+    # Players with the most wins, names with quotes do not fit in the legacy eval string
+    winners = data_object['winner_name'].value_counts().index
+    winners = [name for name in winners if "'" not in name]
+    print('%-8s %12s %12s %12s %14s' % ('players', 'legacy (s)', 'isin (s)', 'regex (s)', 'category (s)'))
+    for size in (3, 50, 500):
+        players = list(winners[:size])
+        legacy_time, legacy = timed(legacy_remove_player, players, data_object, 'winner')
+        isin_time, exact = timed(dp.remove_player, players, data_object, 'winner')
+        regex_time, _ = timed(dp.remove_player, players, data_object, 'winner', substring=True)
+        category_time, _ = timed(dp.remove_player, players, data, 'winner')
+        assert(len(legacy) >= len(exact))
+        print('%-8d %12.4f %12.4f %12.4f %14.4f' % (size, legacy_time, isin_time, regex_time, category_time))
+
+if __name__ == '__main__':
+    main()
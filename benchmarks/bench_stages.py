@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import data_processing as dp
+import synthetic_data as sd
+import pipeline as pl
+import render as rd
+import ratings as rt
+import rising_star as rs
+import serving_analysis as sa
+import mental_toughness as mt
+from head_to_head import HeadToHead
+
+MATCH_FILES = "data/atp_matches*.csv"
+RANKING_FILES = "data/atp_rankings*.csv"
+
+# Resampled corpora, one directory per scale
+CORPUS_DIR = os.path.join(dp.CACHE_DIR, 'bench')
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+def corpus(scale, synthetic=False, seed=0):
+    '''
+    Match and ranking files of a corpus, the real files, rows resampled from them or generated files
+
+    A resampled corpus of scale n has n times the rows of every real file,
+    drawn with replacement from the file, so the columns and the distribution
+    of the values are the ones of the Sackmann files, with the real rankings.
+    A synthetic corpus of scale n is written by synthetic_data with 2n
+    tournaments a week and 1000n players, about 1.3n times the real matches.
+    The files are written once.
+
+    Args:
+        scale (int): number of times the real rows, 1 for the real files
+        synthetic (bool): whether the corpus is generated instead of resampled
+        seed (int): seed of the resampling or of the generator
+
+    Returns:
+        The patterns of the match files and of the ranking files
+    '''
+    assert(isinstance(scale, int) and scale > 0)
+    if synthetic:
+        directory = os.path.join(CORPUS_DIR, 'synthetic-x%d' % scale)
+        if not os.path.exists(os.path.join(directory, 'done')):
+            sd.generate(directory, players=1000 * scale, events=2 * scale, seed=seed)
+            open(os.path.join(directory, 'done'), 'w').close()
+        return os.path.join(directory, 'atp_matches_*.csv'), os.path.join(directory, 'atp_rankings_*.csv')
+    if scale == 1:
+        return MATCH_FILES, RANKING_FILES
+    directory = os.path.join(CORPUS_DIR, 'x%d' % scale)
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for f in sorted(glob.glob(MATCH_FILES)):
+        name = os.path.join(directory, os.path.basename(f).replace('atp_matches', 'atp_matches_x%d' % scale))
+        if os.path.exists(name):
+            continue
+        data = pd.read_csv(f, dtype=str, keep_default_na=False)
+        # One copy of the file at a time, written to a temporary file first
+        for copy in range(scale):
+            rows = rng.integers(0, len(data), len(data))
+            data.iloc[rows].to_csv(name + '.tmp', mode='a', header=copy == 0, index=False)
+        os.replace(name + '.tmp', name)
+    return os.path.join(directory, 'atp_matches_x%d_*.csv' % scale), RANKING_FILES
+
+def setup_read(files, ranking_files):
+    '''
+    No inputs, the stage reads the files
+    '''
+    return ()
+
+def run_parse(files):
+    '''
+    Parse the grand slam matches without the cache
+    '''
+    data = dp.read_matches(files, levels=['G'], columns=dp.GSLAM_COLUMNS, use_cache=False)
+    return len(data)
+
+def run_read(files):
+    '''
+    Read the grand slam matches from the cache
+    '''
+    return len(dp.read_gslam_files(files))
+
+def setup_all_data(files, ranking_files):
+    '''
+    The grand slam data
+    '''
+    return (dp.read_gslam_files(files),)
+
+def run_mental_points(files, all_data):
+    '''
+    Build the mental toughness table of every winner
+    '''
+    players = dp.player_table(all_data)
+    mental_df = dp.index_by_name(all_data[['winner_id', 'w_bpSaved', 'w_bpFaced']].groupby('winner_id').sum(), players)
+    mental_df['percentage'] = mt.get_percentage_batch(mental_df['w_bpSaved'], mental_df['w_bpFaced'])
+    mt.add_mental_points_col(mental_df, list(mental_df.index), all_data, players)
+    return len(mental_df)
+
+def run_match_length_diffs(files, all_data):
+    '''
+    Match length differences of every player
+    '''
+    return len(rs.match_length_diffs(all_data)[0])
+
+def run_score_players(files, all_data):
+    '''
+    Rising star scores of every player
+    '''
+    return len(rs.score_players(all_data))
+
+def run_serving_profile(files, all_data):
+    '''
+    Serving profile of every winner
+    '''
+    return len(sa.serving_profile(all_data))
+
+def run_head_to_head(files, all_data):
+    '''
+    Head-to-head matrices and the total wins
+    '''
+    return len(HeadToHead(all_data).total('wins'))
+
+def setup_ratings(files, ranking_files):
+    '''
+    The matches of every level with the rating columns
+    '''
+    return (dp.read_matches(files, columns=rt.RATING_COLUMNS),)
+
+def run_ratings(files, matches):
+    '''
+    Elo ratings of all the matches from scratch
+    '''
+    return len(rt.RatingEngine().process(matches).ratings())
+
+def setup_render(files, ranking_files):
+    '''
+    A pipeline with the tables and the ratings loaded
+    '''
+    pipeline = pl.Pipeline(files, ranking_files)
+    for name in ['all_data', 'ranking_data', 'ratings']:
+        pipeline.get(name)
+    return (pipeline,)
+
+def run_render(files, pipeline):
+    '''
+    Run every report headless and write the figures as html (png for matplotlib)
+    '''
+    out_dir = tempfile.mkdtemp()
+    try:
+        # The printed tables of the reports are not part of the output
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            return len(rd.render_all(pipeline, pl.REPORTS, out_dir, ['html']))
+    finally:
+        shutil.rmtree(out_dir)
+
+# Measured stages, name to the setup building the inputs and the measured function
+STAGES = {
+    'parse_csv': (setup_read, run_parse),
+    'read_gslam_files': (setup_read, run_read),
+    'add_mental_points_col': (setup_all_data, run_mental_points),
+    'match_length_diffs': (setup_all_data, run_match_length_diffs),
+    'score_players': (setup_all_data, run_score_players),
+    'serving_profile': (setup_all_data, run_serving_profile),
+    'head_to_head': (setup_all_data, run_head_to_head),
+    'ratings': (setup_ratings, run_ratings),
+    'render': (setup_render, run_render),
+    }
+
+def memory():
+    '''
+    Resident memory of the process and its peak since the last reset_peak, in MB
+
+    Linux reports both in /proc, elsewhere the peak of the process is used for
+    both, and it is kept across the start of a new process.
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        return int(status['VmRSS'].split()[0]) / 1e3, int(status['VmHWM'].split()[0]) / 1e3
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        peak = peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+        return peak, peak
+
+def reset_peak():
+    '''
+    Start the peak resident memory from the current one, where the system allows it
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def measure_stage(name, files, ranking_files):
+    '''
+    Run the setup and the function of a stage, in a fresh process
+
+    Args:
+        name (str): one of STAGES
+        files (str): pattern of the match files
+        ranking_files (str): pattern of the ranking files
+
+    Returns:
+        Dictionary of the rows in and out, the wall time in seconds, the peak
+        resident memory during the stage and its growth over the memory of the
+        inputs in MB
+    '''
+    setup, run = STAGES[name]
+    inputs = setup(files, ranking_files)
+    reset_peak()
+    before, _ = memory()
+    start = time.perf_counter()
+    rows = run(files, *inputs)
+    wall = time.perf_counter() - start
+    _, peak = memory()
+    first = inputs[0] if inputs else None
+    # The rows of the grand slam data for the stages run on a pipeline
+    first = first.results['all_data'] if hasattr(first, 'results') else first
+    rows_in = None if first is None else len(first)
+    return {'rows_in': rows_in, 'rows_out': rows, 'wall': wall, 'peak_rss': peak, 'rss_growth': peak - before}
+
+def bench(stages, scales, repeat, synthetic=False):
+    '''
+    Measure stages on corpora of several scales
+
+    Every run is a new process, so the peak memory belongs to the stage alone.
+    The cached files and ratings of a corpus are written before its runs.
+
+    Args:
+        stages (list(str)): names of STAGES
+        scales (list(int)): scales of the corpora
+        repeat (int): number of runs of every stage, the fastest is kept
+        synthetic (bool): whether the corpora are generated instead of resampled
+
+    Returns:
+        List of dictionaries, one per corpus and stage
+    '''
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for scale in scales:
+        files, ranking_files = corpus(scale, synthetic)
+        label = ('synthetic-x%d' if synthetic else 'x%d') % scale
+        rows = len(dp.read_gslam_files(files))
+        if 'render' in stages:
+            rt.update_ratings(files)
+        for name in stages:
+            runs = []
+            for _ in range(repeat):
+                with context.Pool(1) as pool:
+                    runs.append(pool.apply(measure_stage, (name, files, ranking_files)))
+            best = min(runs, key=lambda run: run['wall'])
+            best['peak_rss'] = max(run['peak_rss'] for run in runs)
+            results.append(dict(corpus=label, gslam_rows=rows, stage=name, **best))
+            print('%-14s %-24s %10s %10s %10.3f %12.1f %12.1f' % (
+                label, name, best['rows_in'], best['rows_out'], best['wall'], best['peak_rss'], best['rss_growth']))
+    return results
+
+def compare(results, previous):
+    '''
+    Print the wall time and peak memory of results against a previous run
+
+    Args:
+        results (list(dict)): results of bench
+        previous (list(dict)): results of an earlier run
+    '''
+    before = {(run['corpus'], run['stage']): run for run in previous}
+    print('%-14s %-24s %10s %10s %10s %10s' % ('corpus', 'stage', 'wall (s)', 'was (s)', 'ratio', 'peak ratio'))
+    for run in results:
+        old = before.get((run['corpus'], run['stage']))
+        if old is None:
+            continue
+        print('%-14s %-24s %10.3f %10.3f %10.2f %10.2f' % (
+            run['corpus'], run['stage'], run['wall'], old['wall'], run['wall'] / old['wall'], run['peak_rss'] / old['peak_rss']))
+
+def main():
+    '''
+    Measure the ingest, the analyses and the rendering on the real and resampled corpora
+    '''
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--scales', default='1,10', help='comma separated scales of the corpora, e.g. 1,10,100')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to measure')
+    parser.add_argument('--synthetic', action='store_true', help='generate the corpora with synthetic_data instead of resampling')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of every stage, the fastest is kept')
+    parser.add_argument('--output', help='JSON file of the results, in benchmarks/results when missing')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    args = parser.parse_args()
+    stages = args.stages.split(',')
+    assert(all(name in STAGES for name in stages))
+
+    print('%-14s %-24s %10s %10s %10s %12s %12s' % ('corpus', 'stage', 'rows in', 'rows out', 'wall (s)', 'peak (MB)', 'growth (MB)'))
+    results = bench(stages, [int(scale) for scale in args.scales.split(',')], args.repeat, args.synthetic)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('stages-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': platform.platform(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'results': results,
+            }, f, indent=1)
+    print('Results written to', output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+if __name__ == '__main__':
+    main()
@@ -1,91 +1,983 @@
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import os
+import re
 import glob
+import json
+import shutil
+import hashlib
+import zipfile
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import tracing as tr
 
-def read_csv_files(files):
+CACHE_DIR = os.path.join('data', '.cache')
+# Bump when the schema or the snapshot format changes so that cached files are parsed again
+CACHE_VERSION = 5
+
+# Memory-mapped snapshots of the cleaned tables, one directory per table
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+
+# Number of sets kept by parse_scores
+SCORE_SETS = 5
+
+# Column types of the Sackmann match files
+MATCH_SCHEMA = {
+    'tourney_id': 'category', 'tourney_name': 'category', 'surface': 'category',
+    'draw_size': 'Int16', 'tourney_level': 'category', 'tourney_date': 'int32',
+    'match_num': 'Int16', 'winner_id': 'int32', 'winner_seed': 'Int8',
+    'winner_entry': 'category', 'winner_name': 'category', 'winner_hand': 'category',
+    'winner_ht': 'Int16', 'winner_ioc': 'category', 'winner_age': 'float32',
+    'loser_id': 'int32', 'loser_seed': 'Int8', 'loser_entry': 'category',
+    'loser_name': 'category', 'loser_hand': 'category', 'loser_ht': 'Int16',
+    'loser_ioc': 'category', 'loser_age': 'float32', 'score': 'object',
+    'best_of': 'int8', 'round': 'category', 'minutes': 'Int16',
+    'w_ace': 'Int16', 'w_df': 'Int16', 'w_svpt': 'Int16', 'w_1stIn': 'Int16',
+    'w_1stWon': 'Int16', 'w_2ndWon': 'Int16', 'w_SvGms': 'Int16',
+    'w_bpSaved': 'Int16', 'w_bpFaced': 'Int16',
+    'l_ace': 'Int16', 'l_df': 'Int16', 'l_svpt': 'Int16', 'l_1stIn': 'Int16',
+    'l_1stWon': 'Int16', 'l_2ndWon': 'Int16', 'l_SvGms': 'Int16',
+    'l_bpSaved': 'Int16', 'l_bpFaced': 'Int16',
+    'winner_rank': 'Int16', 'winner_rank_points': 'Int32',
+    'loser_rank': 'Int16', 'loser_rank_points': 'Int32',
+    }
+
+# Column types of the Sackmann ranking files
+RANKING_SCHEMA = {
+    'ranking_date': 'int32', 'rank': 'int16', 'player': 'int32', 'points': 'Int32',
+    }
+
+SCHEMA = {**MATCH_SCHEMA, **RANKING_SCHEMA}
+
+# Columns of the match files used by the grand slam analyses
+GSLAM_COLUMNS = [
+    'tourney_name', 'surface', 'tourney_level', 'tourney_date', 'winner_id', 'winner_name', 'loser_id', 'loser_name',
+    'score', 'best_of', 'round', 'minutes', 'w_ace', 'w_df', 'w_svpt',
+    'w_1stIn', 'w_1stWon', 'w_2ndWon', 'w_bpSaved', 'w_bpFaced', 'l_ace',
+    'l_df', 'l_svpt', 'l_1stIn', 'l_1stWon', 'l_2ndWon', 'l_bpSaved', 'l_bpFaced',
+    ]
+
+# Player attributes of the match files kept in the player table, winner_ and loser_ prefixed
+PLAYER_ATTRIBUTES = ['name', 'hand', 'ht', 'ioc']
+
+@tr.traced
+def cache_key(csv_file):
+    '''
+    Compute the key that identifies the current version of a CSV file
+    
+    Args:
+        csv_file (str): path of the CSV file
+
+    Returns:
+        Dictionary with the path, size and modification time of the file, the
+        cache version and the pandas version, since the cached tables are pickled
+    '''
+    assert(isinstance(csv_file, str))
+    stat = os.stat(csv_file)
+    return {'path': os.path.abspath(csv_file), 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'version': CACHE_VERSION, 'pandas': pd.__version__}
+
+@tr.traced
+def cache_name(csv_file):
+    '''
+    Name of the cached data of a CSV file, the file name for the files of the data directory
+
+    Files of other directories, for example generated corpora, get the hash of
+    their directory in front, so that files of the same name are cached apart.
+
+    Args:
+        csv_file (str): path of the CSV file
+
+    Returns:
+        The name without extension
+    '''
+    assert(isinstance(csv_file, str))
+    directory = os.path.dirname(os.path.abspath(csv_file))
+    name = os.path.basename(csv_file)
+    if directory == os.path.abspath('data'):
+        return name
+    return hashlib.md5(directory.encode()).hexdigest()[:8] + '.' + name
+
+@tr.traced
+def replace_file(path, write):
+    '''
+    Write a file through a temporary file renamed over it, so a reader never sees a partial file
+
+    Args:
+        path (str): path of the file
+        write (callable): function writing the temporary file, given its path
+    '''
+    assert(isinstance(path, str))
+    assert(callable(write))
+    temp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    try:
+        write(temp)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+@tr.traced
+def write_json(path, value):
+    '''
+    Write a value to a JSON file, see replace_file
+
+    Args:
+        path (str): path of the file
+        value: the value
+    '''
+    def write(temp):
+        with open(temp, 'w') as f:
+            json.dump(value, f)
+    replace_file(path, write)
+
+@tr.traced
+def cached_key(path):
+    '''
+    Key of a value stored by store_cached
+
+    Args:
+        path (str): path of the stored value without extension
+
+    Returns:
+        The key, None when the value is missing or its key file cannot be read
+    '''
+    assert(isinstance(path, str))
+    try:
+        with open(path + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+@tr.traced
+def load_cached(path, key):
+    '''
+    Load a value stored by store_cached when it was stored with the given key
+
+    The pickle holds its key as well, so a pickle replaced after its key file
+    was read is not taken for the value of that key.
+
+    Args:
+        path (str): path of the stored value without extension
+        key: key of the source files, from cache_key
+
+    Returns:
+        The value, None when it is missing, stale or cannot be read
+    '''
+    assert(isinstance(path, str))
+    if cached_key(path) != key:
+        return None
+    try:
+        stored = pd.read_pickle(path + '.pkl', compression=None)
+    except Exception:
+        # Truncated, removed meanwhile or written by another pandas, computed again
+        return None
+    if not (isinstance(stored, tuple) and len(stored) == 2 and stored[0] == key):
+        return None
+    return stored[1]
+
+@tr.traced
+def store_cached(path, key, value):
+    '''
+    Store a value with the key of its source files, for load_cached
+
+    The pickle is written first and the key file last, both through
+    replace_file, so an interrupted or concurrent writer never leaves a key
+    that matches a partial or different value.
+
+    Args:
+        path (str): path of the stored value without extension, its directory is created when missing
+        key: key of the source files, from cache_key
+        value: a picklable value
+    '''
+    assert(isinstance(path, str))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    replace_file(path + '.pkl', lambda temp: pd.to_pickle((key, value), temp, compression=None))
+    write_json(path + '.json', key)
+
+@tr.traced
+def apply_schema(df, engine='c'):
+    '''
+    Convert a dataframe parsed by parse_csv to the types declared in SCHEMA
+    
+    Nullable integer columns are parsed as floats and converted here, which is
+    several times faster than letting read_csv build them.
+
+    Args:
+        df (pd.DataFrame): data parsed from a CSV file
+        engine (str): parser engine the data was parsed with
+
+    Returns:
+        The converted dataframe
+    '''
+    assert(isinstance(df, pd.DataFrame))
+    for col in df.columns:
+        dtype = SCHEMA.get(col, '')
+        if dtype[:1].isupper():
+            values = df[col].to_numpy(dtype='float64')
+            mask = np.isnan(values)
+            df[col] = pd.arrays.IntegerArray(np.where(mask, 0, values).astype(dtype.lower()), mask)
+        # pyarrow reads empty strings as '' instead of missing values
+        elif engine == 'pyarrow' and dtype == 'category' and '' in df[col].cat.categories:
+            df[col] = df[col].cat.remove_categories([''])
+        elif engine == 'pyarrow' and df[col].dtype == object:
+            df[col] = df[col].replace('', np.nan)
+    return df
+
+@tr.traced
+def parse_csv(csv_file, usecols=None, engine='c', chunksize=None):
     '''
-    Read certain files that matches the given file name to a dataframe
+    Parse a CSV file with the types declared in SCHEMA
     
+    Args:
+        csv_file (str): path of the CSV file
+        usecols (list(str)): columns to keep, all columns when None
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
+        chunksize (int): number of rows per chunk, the whole file when None
+
+    Returns:
+        The dataframe contains the data of the CSV file, or an iterator over
+        dataframes of chunksize rows when chunksize is given
+    '''
+    assert(isinstance(csv_file, str))
+    assert(engine in ('c', 'python', 'pyarrow'))
+    assert(chunksize is None or (isinstance(chunksize, int) and engine != 'pyarrow'))
+    header = [col for col in pd.read_csv(csv_file, nrows=0).columns if usecols is None or col in usecols]
+    parse_schema = {col: SCHEMA[col] for col in header if col in SCHEMA and not SCHEMA[col][0].isupper()}
+    data = pd.read_csv(csv_file, dtype=parse_schema, usecols=usecols, engine=engine, chunksize=chunksize)
+    # pyarrow keeps the column order of usecols
+    if chunksize is None:
+        return apply_schema(data[header], engine)
+    return (apply_schema(df[header], engine) for df in data)
+
+@tr.traced
+def read_csv_file(csv_file, use_cache=True, usecols=None, engine='c'):
+    '''
+    Read one CSV file to a dataframe typed with SCHEMA, going through the on-disk cache
+    
+    The parsed dataframe is stored in CACHE_DIR together with the key of the
+    source file, and is reused as long as the size and mtime of the file and
+    the pandas version match. Both files are written through a temporary file,
+    the key last, so a concurrent or interrupted writer never leaves a partial
+    table under a matching key.
+
+    Args:
+        csv_file (str): path of the CSV file
+        use_cache (bool): whether the on-disk cache is read and updated
+        usecols (list(str)): columns to keep, all columns when None
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
+
+    Returns:
+        The dataframe contains the data of the CSV file
+    '''
+    assert(isinstance(csv_file, str))
+    assert(isinstance(use_cache, bool))
+    assert(usecols is None or isinstance(usecols, list))
+    if not use_cache:
+        return parse_csv(csv_file, usecols, engine)
+    key = cache_key(csv_file)
+    path = os.path.join(CACHE_DIR, cache_name(csv_file))
+    df = load_cached(path, key)
+    if df is None:
+        df = parse_csv(csv_file, engine=engine)
+        store_cached(path, key, df)
+    if usecols is not None:
+        df = df[[col for col in df.columns if col in usecols]]
+    return df
+
+@tr.traced
+def concat_frames(frames):
+    '''
+    Concatenate dataframes read from several files in one pass
+    
+    Categorical columns get the union of the categories of all the frames,
+    otherwise pandas would fall back to object columns.
+
+    Args:
+        frames (list(pd.DataFrame)): dataframes with the same columns
+
+    Returns:
+        The concatenated dataframe
+    '''
+    assert(isinstance(frames, list))
+    if not frames:
+        return pd.DataFrame()
+    columns = list(frames[0].columns)
+    categorical = [col for col in columns if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames)]
+    all_data = pd.concat([df[[col for col in df.columns if col not in categorical]] for df in frames])
+    for col in categorical:
+        all_data[col] = union_categoricals([df[col] for df in frames], sort_categories=True)
+    return all_data[columns + [col for col in all_data.columns if col not in columns]]
+
+@tr.traced
+def read_csv_files(files, use_cache=True, usecols=None, workers=1, engine='c'):
+    '''
+    Read certain files that matches the given file name to a dataframe typed with SCHEMA
+    
+    With more than one worker the files are parsed concurrently (see map_files),
+    the rows are always in the order of the sorted file names.
+
     Args:
         files (str): all the files that matches the string will be read
+        use_cache (bool): whether parsed files are cached on disk
+        usecols (list(str)): columns to keep, all columns when None
+        workers (int): number of files parsed at the same time
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
 
     Returns:
         The dataframe contains all data from read CSV files
     '''
     assert(isinstance(files, str))
+    assert(isinstance(use_cache, bool))
+    assert(isinstance(workers, int) and workers > 0)
     if not os.path.exists('data'):
         os.chdir('..')
     path = os.getcwd()
-    csv_files = glob.glob(os.path.join(path, files))
-    all_data = pd.DataFrame()
-    for f in csv_files:
-        df = pd.read_csv(f)
-        all_data = pd.concat([all_data, df])
-    return all_data
+    csv_files = sorted(glob.glob(os.path.join(path, files)))
+    return concat_frames(map_files(read_csv_file, csv_files, workers, engine, use_cache, usecols, engine))
+
+@tr.traced
+def map_files(func, csv_files, workers, engine, *args):
+    '''
+    Apply a reading function to every file, concurrently when there are several workers
+    
+    Files are read in threads for the pyarrow engine which releases the GIL and
+    in processes otherwise. The results are in the order of the given files.
 
-def read_gslam_files(csv_files):
+    Args:
+        func (callable): function called as func(csv_file, *args)
+        csv_files (list(str)): paths of the files
+        workers (int): number of files read at the same time
+        engine (str): parser engine of pd.read_csv
+
+    Returns:
+        The list of results of func
+    '''
+    assert(callable(func))
+    assert(isinstance(csv_files, list))
+    assert(isinstance(workers, int) and workers > 0)
+    args = [csv_files] + [repeat(arg) for arg in args]
+    if workers == 1 or len(csv_files) < 2:
+        return list(map(func, *args))
+    executor = ThreadPoolExecutor if engine == 'pyarrow' else ProcessPoolExecutor
+    with executor(max_workers=min(workers, len(csv_files))) as pool:
+        return list(pool.map(func, *args))
+
+@tr.traced
+def match_filter(data, levels=None, surfaces=None, start=None, end=None, players=None):
+    '''
+    Compute which matches pass the given filters, a filter set to None is not applied
+    
+    Args:
+        data (pd.DataFrame): data of matches
+        levels (list(str)): tourney levels to keep, e.g. ['G'] for Grand Slams
+        surfaces (list(str)): surfaces to keep
+        start (int): first tourney date to keep as YYYYMMDD
+        end (int): last tourney date to keep as YYYYMMDD
+        players (list(str)): keep the matches won or lost by these players
+
+    Returns:
+        Boolean numpy array, True for the matches to keep
+    '''
+    assert(isinstance(data, pd.DataFrame))
+    keep = np.ones(len(data), dtype=bool)
+    if levels is not None:
+        keep &= data['tourney_level'].isin(levels).to_numpy()
+    if surfaces is not None:
+        keep &= data['surface'].isin(surfaces).to_numpy()
+    if start is not None:
+        keep &= (data['tourney_date'] >= start).to_numpy()
+    if end is not None:
+        keep &= (data['tourney_date'] <= end).to_numpy()
+    if players is not None:
+        keep &= (data['winner_name'].isin(players) | data['loser_name'].isin(players)).to_numpy()
+    return keep
+
+@tr.traced
+def filter_columns(filters):
+    '''
+    List the columns needed to evaluate the given filters
+    
+    Args:
+        filters (dict): keyword arguments of match_filter
+
+    Returns:
+        The list of column names
+    '''
+    assert(isinstance(filters, dict))
+    needed = {
+        'levels': ['tourney_level'], 'surfaces': ['surface'], 'start': ['tourney_date'],
+        'end': ['tourney_date'], 'players': ['winner_name', 'loser_name'],
+        }
+    return [col for key, cols in needed.items() if filters.get(key) is not None for col in cols]
+
+@tr.traced
+def read_match_file(csv_file, filters, columns=None, use_cache=True, engine='c', chunksize=100000):
+    '''
+    Read the matches of one file that pass the filters
+    
+    From the cache the typed file is filtered at once. Without the cache the
+    file is parsed in chunks and each chunk is filtered before the next one is
+    read, so only the kept rows and columns are held in memory.
+
+    Args:
+        csv_file (str): path of the match CSV file
+        filters (dict): keyword arguments of match_filter
+        columns (list(str)): columns to return, all columns when None
+        use_cache (bool): whether parsed files are cached on disk
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
+        chunksize (int): number of rows parsed at a time without the cache
+
+    Returns:
+        The dataframe contains the kept matches
+    '''
+    assert(isinstance(csv_file, str))
+    assert(isinstance(filters, dict))
+    assert(columns is None or isinstance(columns, list))
+    usecols = None if columns is None else columns + [col for col in filter_columns(filters) if col not in columns]
+    if use_cache or engine == 'pyarrow':
+        chunks = [read_csv_file(csv_file, use_cache, usecols, engine)]
+    else:
+        chunks = parse_csv(csv_file, usecols, engine, chunksize)
+    kept = []
+    for df in chunks:
+        df = df[match_filter(df, **filters)]
+        if columns is not None:
+            df = df[[col for col in df.columns if col in columns]]
+        kept.append(df)
+    return concat_frames(kept)
+
+@tr.traced
+def read_matches(files, levels=None, surfaces=None, start=None, end=None, players=None, columns=None,
+                 use_cache=True, workers=1, engine='c', chunksize=100000):
+    '''
+    Read the matches from certain files that pass the given filters
+    
+    The filters are applied file by file (and chunk by chunk without the cache),
+    so the rows and columns that are not asked for are never concatenated.
+
+    Args:
+        files (str): all the files that matches the string will be read
+        levels (list(str)): tourney levels to keep, e.g. ['G'] for Grand Slams
+        surfaces (list(str)): surfaces to keep
+        start (int): first tourney date to keep as YYYYMMDD
+        end (int): last tourney date to keep as YYYYMMDD
+        players (list(str)): keep the matches won or lost by these players
+        columns (list(str)): columns to return, all columns when None
+        use_cache (bool): whether parsed files are cached on disk
+        workers (int): number of files parsed at the same time
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
+        chunksize (int): number of rows parsed at a time without the cache
+
+    Returns:
+        The dataframe contains the kept matches
+    '''
+    assert(isinstance(files, str))
+    assert(isinstance(use_cache, bool))
+    if not os.path.exists('data'):
+        os.chdir('..')
+    csv_files = sorted(glob.glob(os.path.join(os.getcwd(), files)))
+    filters = {'levels': levels, 'surfaces': surfaces, 'start': start, 'end': end, 'players': players}
+    return concat_frames(map_files(read_match_file, csv_files, workers, engine, filters, columns, use_cache, engine, chunksize))
+
+@tr.traced
+def analysis_dtypes(data, categories=False):
+    '''
+    Convert the compact SCHEMA types to the types the analyses work with
+    
+    Categorical columns become strings, nullable integer columns become floats
+    and the other integer columns become int64, as pandas infers them from the CSV.
+
+    Args:
+        data (pd.DataFrame): data read with SCHEMA
+        categories (bool): whether the categorical columns are kept as they are
+
+    Returns:
+        The converted dataframe
+    '''
+    assert(isinstance(data, pd.DataFrame))
+    assert(isinstance(categories, bool))
+    dtypes = {}
+    for col, dtype in data.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            if not categories:
+                dtypes[col] = 'object'
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'iu':
+            dtypes[col] = 'float64'
+        elif dtype.kind in 'iu':
+            dtypes[col] = 'int64'
+        elif dtype.kind == 'f':
+            dtypes[col] = 'float64'
+    return data.astype(dtypes)
+
+@tr.traced
+def read_gslam_files(csv_files, workers=1, engine='c', snapshot=False):
     '''
     Read and process the grand slam data for future data analysis
     
     Args:
         csv_files (str): all the files that matches the string will be read
+        workers (int): number of files parsed at the same time
+        engine (str): parser engine of pd.read_csv, 'c', 'python' or 'pyarrow'
+        snapshot (bool): whether the data is opened from a memory-mapped snapshot, written when missing or stale
 
     Returns:
-        The dataframe contains the grand slam data for future data analysis
+        The dataframe contains the grand slam data for future data analysis, the
+        text columns are categorical in a snapshot so that their codes stay mapped
     '''
     assert(isinstance(csv_files, str))
-    all_data = read_csv_files(csv_files)
+    assert(isinstance(snapshot, bool))
+    if snapshot:
+        name, key = snapshot_name('gslam', csv_files), snapshot_key(csv_files)
+        all_data = open_snapshot(name, key)
+        if all_data is not None:
+            return all_data
     # Only take matches that are Grand Slams (G)
-    all_data = all_data[all_data["tourney_level"] == "G"]
+    all_data = read_matches(csv_files, levels=["G"], columns=GSLAM_COLUMNS, workers=workers, engine=engine)
 
     # Reset the Index
-    all_data.reset_index(inplace=True)
-
-    # Drop Unused Collumns
-    collumns_to_drop = [
-        'tourney_id', 'tourney_date', 'index', 'draw_size', 'match_num', 
-        'winner_id', 'winner_seed', 'winner_entry', 'winner_hand', 'winner_ht', 
-        'winner_ioc', 'winner_age', 'loser_id', 'loser_seed', 'loser_entry', 
-        'loser_hand', 'loser_ht', 'loser_ioc', 'loser_age', 'w_SvGms',
-        'l_SvGms', 'winner_rank', 'winner_rank_points', 'loser_rank', 'loser_rank_points'
-        ]
-
-    all_data.drop(collumns_to_drop, axis=1, inplace=True)
+    all_data.reset_index(drop=True, inplace=True)
 
     # Drop Rows with Na as values
     all_data.dropna(inplace=True)
+    all_data = analysis_dtypes(all_data, categories=snapshot)
+    if snapshot:
+        write_snapshot(all_data, name, key)
+        return open_snapshot(name, key)
     return all_data
 
-def read_ranking_files(ranking_csv):
+@tr.traced
+def player_table(match_data):
+    '''
+    Build the table of the players of matches, indexed by player id
+
+    Every attribute of PLAYER_ATTRIBUTES found in the data is kept, with the
+    last known value of the player when the matches have a tourney_date column.
+
+    Args:
+        match_data (pd.DataFrame): data of matches with winner_id and loser_id columns
+
+    Returns:
+        Dataframe indexed by the int32 player id, one row per player
+    '''
+    assert(isinstance(match_data, pd.DataFrame))
+    attributes = [col for col in PLAYER_ATTRIBUTES if 'winner_' + col in match_data.columns and 'loser_' + col in match_data.columns]
+    frames = []
+    for status in ('winner', 'loser'):
+        columns = {status + '_' + col: col for col in attributes}
+        frame = match_data[[status + '_id'] + list(columns)].rename(columns={status + '_id': 'id', **columns})
+        if 'tourney_date' in match_data.columns:
+            frame['tourney_date'] = match_data['tourney_date'].to_numpy()
+        frames.append(frame)
+    players = concat_frames(frames)
+    if 'tourney_date' in players.columns:
+        players = players.sort_values('tourney_date', kind='stable').drop(columns='tourney_date')
+    players = players.groupby('id', sort=True, observed=True).last()
+    players.index = players.index.astype('int32')
+    for col in players.columns:
+        if isinstance(players[col].dtype, pd.CategoricalDtype):
+            players[col] = players[col].astype(object)
+    return players
+
+@tr.traced
+def read_players(files, workers=1):
+    '''
+    Read the player table of match files
+
+    Args:
+        files (str): all the files that matches the string will be read
+        workers (int): number of files parsed at the same time
+
+    Returns:
+        Dataframe of player_table indexed by player id
+    '''
+    assert(isinstance(files, str))
+    columns = ['tourney_date'] + [status + '_' + col for status in ('winner', 'loser') for col in ['id'] + PLAYER_ATTRIBUTES]
+    return player_table(read_matches(files, columns=columns, workers=workers))
+
+@tr.traced
+def player_ids(players, names):
+    '''
+    Look up the ids of players by name
+
+    Args:
+        players (pd.DataFrame): player table of player_table
+        names (list(str)): names of players
+
+    Returns:
+        List of the int ids in the order of the names
+    '''
+    assert(isinstance(players, pd.DataFrame))
+    assert(isinstance(names, list))
+    ids = pd.Series(players.index, index=players['name'].to_numpy())
+    ids = ids[~ids.index.duplicated()]
+    missing = [name for name in names if name not in ids.index]
+    if missing:
+        raise KeyError('Unknown players: ' + ', '.join(missing))
+    return [int(i) for i in ids[names]]
+
+@tr.traced
+def index_by_name(data, players, sort=True):
+    '''
+    Replace the player id index of per player data by the names of the players
+
+    The analyses group the matches by player id and label the result once with
+    this function, so a player is never matched by name.
+
+    Args:
+        data (pd.DataFrame or pd.Series): data indexed by player id
+        players (pd.DataFrame): player table of player_table
+        sort (bool): whether the rows are sorted by name
+
+    Returns:
+        The data indexed by player name
+    '''
+    assert(isinstance(data, (pd.DataFrame, pd.Series)))
+    assert(isinstance(players, pd.DataFrame))
+    names = players['name'].reindex(data.index).to_numpy(dtype=object)
+    data = data.set_axis(pd.Index(names, name='name'), axis=0)
+    return data.sort_index(kind='stable') if sort else data
+
+@tr.traced
+def join_players(data, players, on='player', columns=None, prefix=''):
+    '''
+    Add the attributes of the players to data keyed by player id, in one merge
+
+    Args:
+        data (pd.DataFrame): data with a player id column, for example rankings
+        players (pd.DataFrame): player table of player_table
+        on (str): name of the player id column of data
+        columns (list(str)): attributes of the players to add, all when None
+        prefix (str): prefix of the added column names
+
+    Returns:
+        The dataframe with the added columns, unknown players get missing values
+    '''
+    assert(isinstance(data, pd.DataFrame))
+    assert(isinstance(players, pd.DataFrame))
+    attributes = players[list(players.columns) if columns is None else columns].add_prefix(prefix)
+    return data.merge(attributes, how='left', left_on=on, right_index=True, sort=False)
+
+@tr.traced
+def read_ranking_files(ranking_csv, snapshot=False):
     '''
     Read and process the ranking data for future data analysis
     
     Args:
         ranking_csv (str): all the files that matches the string will be read
+        snapshot (bool): whether the data is opened from a memory-mapped snapshot, written when missing or stale
 
     Returns:
         The dataframe contains the ranking data for future data analysis
     '''
     assert(isinstance(ranking_csv, str))
+    assert(isinstance(snapshot, bool))
+    if snapshot:
+        name, key = snapshot_name('rankings', ranking_csv), snapshot_key(ranking_csv)
+        ranking_data = open_snapshot(name, key)
+        if ranking_data is not None:
+            return ranking_data
     ranking_data = read_csv_files(ranking_csv)
+    if snapshot:
+        write_snapshot(ranking_data, name, key)
+        return open_snapshot(name, key)
     return ranking_data
 
-def remove_player(player_list, data, status):
+@tr.traced
+def snapshot_name(table, files):
+    '''
+    Name of the snapshot of a table read from certain files
+
+    Args:
+        table (str): name of the table, for example 'gslam' or 'rankings'
+        files (str): pattern of the files the table is read from
+
+    Returns:
+        The name of the snapshot directory in SNAPSHOT_DIR
+    '''
+    assert(isinstance(table, str))
+    assert(isinstance(files, str))
+    return table + '.' + hashlib.md5(files.encode()).hexdigest()[:8]
+
+@tr.traced
+def snapshot_key(files):
+    '''
+    Compute the key of the current version of the files a snapshot is built from
+
+    Args:
+        files (str): all the files that matches the string are part of the key
+
+    Returns:
+        List of the cache keys of the sorted files
+    '''
+    assert(isinstance(files, str))
+    if not os.path.exists('data'):
+        os.chdir('..')
+    return [cache_key(f) for f in sorted(glob.glob(os.path.join(os.getcwd(), files)))]
+
+@tr.traced
+def snapshot_directory(name, key=None):
+    '''
+    Directory of the version of a snapshot built from files of a certain key
+
+    Every key has its own directory, so a new version is written next to the
+    one readers may have open instead of over it.
+
+    Args:
+        name (str): name of the snapshot in SNAPSHOT_DIR
+        key (list): key of the source files
+
+    Returns:
+        The path of the directory
+    '''
+    assert(isinstance(name, str))
+    version = hashlib.md5(json.dumps([CACHE_VERSION, key], sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(SNAPSHOT_DIR, name + '.' + version)
+
+@tr.traced
+def write_snapshot(data, name, key=None):
+    '''
+    Write a dataframe to a columnar snapshot that open_snapshot maps into memory
+
+    Every column is stored as a .npy file: numpy columns as they are, nullable
+    integers as values and mask, categories and object columns as codes with
+    the categories in the metadata. The snapshot is written to a temporary
+    directory renamed to the directory of its key (see snapshot_directory),
+    so readers never see a partial or missing one. When another process
+    renamed the same version first, its snapshot is kept. The older versions
+    are removed where the system allows it.
+
+    Args:
+        data (pd.DataFrame): the table, with a unique name for every column
+        name (str): name of the snapshot in SNAPSHOT_DIR
+        key (list): key of the source files checked by open_snapshot
+    '''
+    assert(isinstance(data, pd.DataFrame))
+    assert(isinstance(name, str))
+    directory = snapshot_directory(name, key)
+    temp = '%s.%d.%d.tmp' % (directory, os.getpid(), threading.get_ident())
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    columns = []
+    for i, col in enumerate(data.columns):
+        values = data[col]
+        meta = {'name': col, 'file': str(i)}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            meta.update(kind='category', categories=values.cat.categories.tolist())
+            np.save(os.path.join(temp, meta['file'] + '.npy'), values.cat.codes.to_numpy())
+        elif isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+            array = values.array
+            meta.update(kind='masked', dtype=str(values.dtype))
+            np.save(os.path.join(temp, meta['file'] + '.npy'), array._data)
+            np.save(os.path.join(temp, meta['file'] + '.mask.npy'), array._mask)
+        elif values.dtype == object:
+            codes, categories = pd.factorize(values)
+            meta.update(kind='object', categories=categories.tolist())
+            np.save(os.path.join(temp, meta['file'] + '.npy'), codes.astype(np.int32))
+        else:
+            meta.update(kind='numpy')
+            np.save(os.path.join(temp, meta['file'] + '.npy'), values.to_numpy())
+        columns.append(meta)
+    np.save(os.path.join(temp, 'index.npy'), data.index.to_numpy())
+    with open(os.path.join(temp, 'meta.json'), 'w') as f:
+        json.dump({'key': key, 'version': CACHE_VERSION, 'rows': len(data), 'columns': columns}, f)
+    try:
+        os.rename(temp, directory)
+    except OSError:
+        # Another process renamed the same version first
+        shutil.rmtree(temp, ignore_errors=True)
+        if not snapshot_current(directory, key):
+            raise
+    for other in glob.glob(os.path.join(SNAPSHOT_DIR, glob.escape(name) + '.*')):
+        if other != directory and not other.endswith('.tmp'):
+            # Mapped files of open snapshots cannot be removed on Windows
+            shutil.rmtree(other, ignore_errors=True)
+
+@tr.traced
+def snapshot_current(directory, key=None):
+    '''
+    Whether a snapshot directory is complete and built from files of a certain key
+
+    Args:
+        directory (str): path of the snapshot directory
+        key (list): expected key of the source files, not checked when None
+
+    Returns:
+        The metadata of the snapshot, None when it is missing, of another version or another key
+    '''
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta['version'] != CACHE_VERSION or (key is not None and meta['key'] != key):
+        return None
+    return meta
+
+@tr.traced
+def open_snapshot(name, key=None, columns=None):
+    '''
+    Open a snapshot written by write_snapshot, mapping the columns into memory
+
+    The numpy, nullable integer and category columns are read-only views of the
+    mapped files, so processes opening the same snapshot share one copy in the
+    page cache. Only the object columns are built in memory. The mapped
+    columns are read-only, copy the dataframe before modifying it in place.
+
+    Args:
+        name (str): name of the snapshot in SNAPSHOT_DIR
+        key (list): expected key of the source files, the latest version is opened when None
+        columns (list(str)): columns to open, all columns when None
+
+    Returns:
+        The dataframe, or None when the snapshot is missing or its key differs
+    '''
+    assert(isinstance(name, str))
+    assert(columns is None or isinstance(columns, list))
+    if key is not None:
+        directory = snapshot_directory(name, key)
+    else:
+        versions = [path for path in glob.glob(os.path.join(SNAPSHOT_DIR, glob.escape(name) + '.*')) if not path.endswith('.tmp')]
+        if not versions:
+            return None
+        directory = max(versions, key=os.path.getmtime)
+    meta = snapshot_current(directory, key)
+    if meta is None:
+        return None
+    load = lambda file: np.load(os.path.join(directory, file + '.npy'), mmap_mode='r')
+    arrays = {}
+    for col in meta['columns']:
+        if columns is not None and col['name'] not in columns:
+            continue
+        if col['kind'] == 'category':
+            arrays[col['name']] = pd.Categorical.from_codes(load(col['file']), categories=col['categories'])
+        elif col['kind'] == 'masked':
+            array_type = pd.api.types.pandas_dtype(col['dtype']).construct_array_type()
+            arrays[col['name']] = array_type(load(col['file']), load(col['file'] + '.mask'))
+        elif col['kind'] == 'object':
+            arrays[col['name']] = pd.Categorical.from_codes(load(col['file']), categories=col['categories']).to_numpy(dtype=object)
+        else:
+            arrays[col['name']] = load(col['file'])
+    # copy=False keeps one block per column instead of copying them into 2D blocks
+    return pd.DataFrame(arrays, index=pd.Index(load('index')), copy=False)
+
+@tr.traced
+def parse_score_strings(scores):
+    '''
+    Parse distinct score strings like "6-4 3-6 7-6(5)" into fixed width arrays
+    
+    Args:
+        scores (np.ndarray): distinct score strings
+
+    Returns:
+        Dictionary of numpy arrays with one row per string, see parse_scores
+    '''
+    assert(isinstance(scores, np.ndarray))
+    n = len(scores)
+    parsed = {
+        'score': scores.astype(str),
+        'winner_games': np.full((n, SCORE_SETS), -1, dtype=np.int8),
+        'loser_games': np.full((n, SCORE_SETS), -1, dtype=np.int8),
+        'tiebreak': np.full((n, SCORE_SETS), -1, dtype=np.int8),
+        'sets': np.zeros(n, dtype=np.int8),
+        }
+    strings = pd.Series(parsed['score'], dtype=object)
+    sets = strings.str.extractall(r'(\d+)-(\d+)(?:\((\d+)\))?')
+    if len(sets):
+        row = sets.index.get_level_values(0).to_numpy()
+        number = sets.index.get_level_values(1).to_numpy()
+        keep = number < SCORE_SETS
+        row, number, sets = row[keep], number[keep], sets[keep]
+        parsed['winner_games'][row, number] = sets[0].astype(int).to_numpy()
+        parsed['loser_games'][row, number] = sets[1].astype(int).to_numpy()
+        parsed['tiebreak'][row, number] = sets[2].fillna(-1).astype(int).to_numpy()
+        np.add.at(parsed['sets'], row, 1)
+    parsed['retired'] = strings.str.contains('RET').to_numpy()
+    parsed['walkover'] = strings.str.contains('W/O').to_numpy()
+    parsed['defaulted'] = strings.str.contains('DEF|Def').to_numpy()
+    parsed['abandoned'] = strings.str.contains('abandoned|ABN|ABD|unfinished').to_numpy()
+    # Match tiebreaks are written in brackets, e.g. "6-4 5-7 [10-6]"
+    parsed['match_tiebreak'] = strings.str.contains(r'\[').to_numpy()
+    return parsed
+
+@tr.traced
+def parse_scores(score, use_cache=True):
+    '''
+    Parse a score column into fixed width numpy arrays
+    
+    Every distinct score string is parsed once, and the parsed strings are kept
+    in CACHE_DIR so that later runs only parse the scores they have not seen.
+    The cache is written through replace_file, and an unreadable cache is
+    parsed again. Sets beyond SCORE_SETS are ignored.
+
+    Args:
+        score (pd.Series): score strings of the matches
+        use_cache (bool): whether the parsed strings are cached on disk
+
+    Returns:
+        Dictionary of numpy arrays aligned with score:
+        'winner_games', 'loser_games' (int8, matches x SCORE_SETS, -1 for sets not played),
+        'tiebreak' (int8, matches x SCORE_SETS, points of the tiebreak loser, -1 without tiebreak),
+        'sets' (int8, number of sets played, a match tiebreak counts as a set),
+        'retired', 'walkover', 'defaulted', 'abandoned' and 'match_tiebreak' (bool)
+    '''
+    assert(isinstance(score, pd.Series))
+    assert(isinstance(use_cache, bool))
+    codes, uniques = pd.factorize(score.astype(object))
+    uniques = np.asarray(uniques, dtype=str)
+    cache_file = os.path.join(CACHE_DIR, 'scores.npz')
+    known = parse_score_strings(np.empty(0, dtype=str))
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with np.load(cache_file) as cached:
+                if int(cached['version']) == CACHE_VERSION and set(cached.files) == set(known) | {'version'}:
+                    known = {key: cached[key] for key in known}
+        except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+            # Written by an older numpy or removed meanwhile, parsed again below
+            pass
+    new = np.setdiff1d(uniques, known['score'])
+    if len(new):
+        parsed = parse_score_strings(new)
+        known = {key: np.concatenate([known[key], parsed[key]]) for key in known}
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            def write(temp):
+                # A file object, np.savez would add .npz to the temporary name
+                with open(temp, 'wb') as f:
+                    np.savez(f, version=CACHE_VERSION, **known)
+            replace_file(cache_file, write)
+    position = pd.Index(known['score']).get_indexer(uniques)
+    # Missing scores (code -1) get the parse of an empty string
+    empty = parse_score_strings(np.array(['']))
+    return {key: np.concatenate([values[position], empty[key]])[codes] for key, values in known.items() if key != 'score'}
+
+@tr.traced
+def remove_player(player_list, data, status, substring=False):
     '''
     Remove the data of lost or won matches of given players
     
+    Names are matched exactly with one isin pass over the name column, or with
+    one regular expression of all the names when substring is True. Integer
+    player ids are matched against the id column.
+
     Args:
-        player_list (list(str)): the list of givn players
+        player_list (list(str) or list(int)): the list of given players, names or ids
         data (pd.DataFrame): data of all matches
         status (str): indicates whether the won or lost games to be remove
+        substring (bool): whether a name matches every name containing it
 
     Returns:
         The dataframe contains the remaining data
     '''
     assert(isinstance(player_list, list))
     assert(isinstance(data, pd.DataFrame))
-    assert(isinstance(status, str))
-    data_other  = data.copy()
-    for player in player_list:
-        data_other = data_other[~eval('data_other.'+status+'_name.str.contains(\''+player+'\')')]
-    return data_other
\ No newline at end of file
+    assert(status in ('winner', 'loser'))
+    assert(isinstance(substring, bool))
+    if player_list and all(isinstance(player, (int, np.integer)) for player in player_list):
+        remove = data[status + '_id'].isin(player_list)
+    elif substring and player_list:
+        remove = data[status + '_name'].astype(str).str.contains('|'.join(re.escape(player) for player in player_list))
+    else:
+        remove = data[status + '_name'].isin(player_list)
+    return data[~remove.to_numpy()]
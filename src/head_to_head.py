@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import data_processing as dp
+
+# Statistics of the matrices, the entry [i, j] sums the matches between the
+# players i and j from the side of player i
+STATS = ['wins', 'minutes', 'sets', 'bpSaved', 'bpFaced']
+
+class HeadToHead:
+    '''
+    Sparse player x player matrices of the matches between every pair of players
+
+    Players are rows and columns by their position in the sorted player ids.
+    Every match is stored once from the side of each player, so the matrices of
+    any surfaces and period are built in one vectorized pass and kept, as CSR
+    for rows and CSC for columns. The losses are the transposed wins.
+
+    Args:
+        data (pd.DataFrame): data of matches with winner_id, loser_id, score, minutes
+            and break point columns, and surface and tourney_date to filter
+        players (pd.DataFrame): player table of dp.player_table, to add the names
+    '''
+    def __init__(self, data, players=None):
+        assert(isinstance(data, pd.DataFrame))
+        assert(players is None or isinstance(players, pd.DataFrame))
+        winners = data['winner_id'].to_numpy(dtype=np.int64)
+        losers = data['loser_id'].to_numpy(dtype=np.int64)
+        self.ids = np.unique(np.concatenate([winners, losers]))
+        self.names = None if players is None else players['name'].reindex(self.ids).to_numpy()
+        w = np.searchsorted(self.ids, winners)
+        l = np.searchsorted(self.ids, losers)
+
+        # Sets won by each side, the last set of an unfinished match is left out
+        scores = dp.parse_scores(data['score'])
+        played = scores['winner_games'] >= 0
+        unfinished = scores['retired'] | scores['defaulted'] | scores['abandoned']
+        rows = np.arange(len(data))
+        last = np.maximum(scores['sets'].astype(int) - 1, 0)
+        played[rows, last] &= ~unfinished
+        sets_w = (played & (scores['winner_games'] > scores['loser_games'])).sum(axis=1)
+        sets_l = (played & (scores['winner_games'] < scores['loser_games'])).sum(axis=1)
+        stats = lambda col: np.nan_to_num(data[col].to_numpy(dtype='float64', na_value=np.nan))
+        minutes = stats('minutes')
+
+        # One entry per match and side
+        self.rows = np.concatenate([w, l])
+        self.columns = np.concatenate([l, w])
+        self.values = {
+            'wins': np.concatenate([np.ones(len(data)), np.zeros(len(data))]),
+            'minutes': np.concatenate([minutes, minutes]),
+            'sets': np.concatenate([sets_w, sets_l]).astype('float64'),
+            'bpSaved': np.concatenate([stats('w_bpSaved'), stats('l_bpSaved')]),
+            'bpFaced': np.concatenate([stats('w_bpFaced'), stats('l_bpFaced')]),
+            }
+        self.surfaces = np.tile(data['surface'].to_numpy(dtype=object), 2) if 'surface' in data.columns else None
+        self.dates = np.tile(data['tourney_date'].to_numpy(dtype=np.int64), 2) if 'tourney_date' in data.columns else None
+        self.matrices = {}
+
+    def index(self, player):
+        '''
+        Position of a player in the rows and columns of the matrices
+
+        Args:
+            player (int): player id
+
+        Returns:
+            The position as an int
+        '''
+        assert(isinstance(player, (int, np.integer)))
+        i = np.searchsorted(self.ids, player)
+        if i == len(self.ids) or self.ids[i] != player:
+            raise KeyError('Unknown player: ' + str(player))
+        return int(i)
+
+    def mask(self, surfaces=None, start=None, end=None):
+        '''
+        Select the entries of the matches on some surfaces and in a period
+
+        Args:
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+
+        Returns:
+            Boolean array over the entries
+        '''
+        assert(surfaces is None or isinstance(surfaces, list))
+        keep = np.ones(len(self.rows), dtype=bool)
+        if surfaces is not None:
+            assert(self.surfaces is not None)
+            keep &= np.isin(self.surfaces, surfaces)
+        if start is not None or end is not None:
+            assert(self.dates is not None)
+        if start is not None:
+            keep &= self.dates >= start
+        if end is not None:
+            keep &= self.dates <= end
+        return keep
+
+    def matrix(self, stat, surfaces=None, start=None, end=None, by='row'):
+        '''
+        Build the matrix of a statistic, once for every filter
+
+        Args:
+            stat (str): one of STATS
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+            by (str): 'row' for a CSR matrix, 'column' for a CSC matrix
+
+        Returns:
+            Sparse players x players matrix
+        '''
+        assert(stat in STATS)
+        assert(by in ('row', 'column'))
+        key = (stat, None if surfaces is None else tuple(sorted(surfaces)), start, end)
+        if key not in self.matrices:
+            keep = self.mask(surfaces, start, end)
+            n = len(self.ids)
+            coo = sparse.coo_matrix((self.values[stat][keep], (self.rows[keep], self.columns[keep])), shape=(n, n))
+            # Duplicate entries of the same pair are summed by the conversion
+            csr = coo.tocsr()
+            self.matrices[key] = (csr, csr.tocsc())
+        return self.matrices[key][0 if by == 'row' else 1]
+
+    def record(self, player, surfaces=None, start=None, end=None):
+        '''
+        Head-to-head record of a player against every opponent
+
+        Args:
+            player (int): player id
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+
+        Returns:
+            Dataframe indexed by opponent id, see versus for the columns
+        '''
+        i = self.index(player)
+        # Opponents the player beat or lost to, the wins are never negative so the sum is zero only without a match
+        wins = self.matrix('wins', surfaces, start, end)[i]
+        losses = self.matrix('wins', surfaces, start, end, by='column')[:, i].T
+        opponents = self.ids[np.unique((wins + losses).nonzero()[1])]
+        return self.versus([player], opponents.tolist(), surfaces, start, end, by_opponent=True)
+
+    def pair(self, player, opponent, surfaces=None, start=None, end=None):
+        '''
+        Head-to-head of two players
+
+        Args:
+            player (int): player id
+            opponent (int): id of the other player
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+
+        Returns:
+            Dictionary of the statistics from the side of player, see versus
+        '''
+        return self.versus([player], [opponent], surfaces, start, end).iloc[0].to_dict()
+
+    def versus(self, players, opponents=None, surfaces=None, start=None, end=None, by_opponent=False):
+        '''
+        Totals of players against a group of opponents
+
+        Args:
+            players (list(int)): player ids
+            opponents (list(int)): ids of the opponents, every other player when None
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+            by_opponent (bool): one row per opponent of a single player instead of one per player
+
+        Returns:
+            Dataframe indexed by player (or opponent) id with the columns wins, losses,
+            matches, minutes, sets_won, sets_lost, bpSaved, bpFaced and name when the
+            player table is known
+        '''
+        assert(isinstance(players, list))
+        assert(opponents is None or isinstance(opponents, list))
+        assert(not by_opponent or len(players) == 1)
+        rows = np.array([self.index(p) for p in players], dtype=np.intp)
+        if opponents is None:
+            columns = np.setdiff1d(np.arange(len(self.ids)), rows)
+        else:
+            columns = np.array([self.index(p) for p in opponents], dtype=np.intp)
+        sums = lambda matrix: np.asarray(matrix.sum(axis=0 if by_opponent else 1)).ravel()
+        block = lambda stat: self.matrix(stat, surfaces, start, end)[rows][:, columns]
+        against = lambda stat: self.matrix(stat, surfaces, start, end, by='column')[:, rows].T[:, columns]
+        table = pd.DataFrame({
+            'wins': sums(block('wins')),
+            'losses': sums(against('wins')),
+            'minutes': sums(block('minutes')),
+            'sets_won': sums(block('sets')),
+            'sets_lost': sums(against('sets')),
+            'bpSaved': sums(block('bpSaved')),
+            'bpFaced': sums(block('bpFaced')),
+            }, index=pd.Index(self.ids[columns if by_opponent else rows], name='id'))
+        counts = ['wins', 'losses', 'sets_won', 'sets_lost']
+        table[counts] = table[counts].astype('int64')
+        table.insert(2, 'matches', table['wins'] + table['losses'])
+        if self.names is not None:
+            table.insert(0, 'name', self.names[columns if by_opponent else rows])
+        return table
+
+    def total(self, stat, surfaces=None, start=None, end=None):
+        '''
+        Totals of a statistic of every player against everyone
+
+        Args:
+            stat (str): one of STATS
+            surfaces (list(str)): surfaces to keep, all surfaces when None
+            start (int): first tourney date as YYYYMMDD, inclusive
+            end (int): last tourney date as YYYYMMDD, inclusive
+
+        Returns:
+            Series indexed by player id
+        '''
+        totals = np.asarray(self.matrix(stat, surfaces, start, end).sum(axis=1)).ravel()
+        return pd.Series(totals, index=pd.Index(self.ids, name='id'), name=stat)
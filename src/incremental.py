@@ -0,0 +1,187 @@
+import os
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+import data_processing as dp
+import serving_analysis as sa
+import mental_toughness as mt
+import rising_star as rs
+
+PARTIALS_DIR = os.path.join(dp.CACHE_DIR, 'partials')
+
+# How the partial sums of the match files are merged, the name of a player is the one of the latest file
+MATCH_PARTIALS = {
+    'name': 'last', 'wins': 'sum', 'losses': 'sum',
+    'w_ace': 'sum', 'w_df': 'sum', 'w_svpt': 'sum', 'w_1stWon': 'sum', 'w_2ndWon': 'sum',
+    'l_ace': 'sum', 'l_df': 'sum', 'l_svpt': 'sum', 'l_1stWon': 'sum', 'l_2ndWon': 'sum',
+    'w_bpSaved': 'sum', 'w_bpFaced': 'sum', 'mental': 'sum',
+    'win_minutes': 'sum', 'win_count': 'sum', 'lose_minutes': 'sum', 'lose_count': 'sum',
+    }
+
+# How the partial sums of the ranking files are merged
+RANKING_PARTIALS = {'best_rank': 'min', 'weeks': 'sum', 'rank_sum': 'sum'}
+
+def match_partials(csv_file, levels=None):
+    '''
+    Compute the per player sums of one match file that the analyses are built from
+
+    The matches are cleaned like in read_gslam_files, rows with missing values are dropped.
+
+    Args:
+        csv_file (str): path of the match CSV file
+        levels (list(str)): tourney levels to keep, all levels when None
+
+    Returns:
+        Dataframe indexed by player id with the columns of MATCH_PARTIALS
+    '''
+    assert(isinstance(csv_file, str))
+    data = dp.read_match_file(csv_file, {'levels': levels}, dp.GSLAM_COLUMNS)
+    data = dp.analysis_dtypes(data.dropna())
+    winners = data['winner_id'].to_numpy()
+    losers = data['loser_id'].to_numpy()
+    players = pd.Index(np.union1d(winners, losers))
+    minutes = data['minutes']
+
+    partials = sa.serving_profile(data, key='id').reindex(players, fill_value=0)
+    partials['name'] = dp.player_table(data)['name'].reindex(players)
+    partials['wins'] = pd.Series(winners).value_counts().reindex(players, fill_value=0)
+    partials['losses'] = pd.Series(losers).value_counts().reindex(players, fill_value=0)
+    partials[['w_bpSaved', 'w_bpFaced']] = data[['w_bpSaved', 'w_bpFaced']].groupby(winners).sum().reindex(players, fill_value=0)
+    partials['mental'] = mt.mental_points(data).groupby(winners).sum().reindex(players, fill_value=0)
+    partials['win_minutes'] = minutes.groupby(winners).sum().reindex(players, fill_value=0)
+    partials['win_count'] = minutes.groupby(winners).count().reindex(players, fill_value=0)
+    partials['lose_minutes'] = minutes.groupby(losers).sum().reindex(players, fill_value=0)
+    partials['lose_count'] = minutes.groupby(losers).count().reindex(players, fill_value=0)
+    return partials[list(MATCH_PARTIALS)]
+
+def ranking_partials(csv_file):
+    '''
+    Compute the per player sums of one ranking file
+
+    Args:
+        csv_file (str): path of the ranking CSV file
+
+    Returns:
+        Dataframe indexed by player id with the columns of RANKING_PARTIALS
+    '''
+    assert(isinstance(csv_file, str))
+    data = dp.read_csv_file(csv_file, usecols=['player', 'rank'])
+    rank = data['rank'].astype('int64').groupby(data['player'].to_numpy())
+    partials = pd.DataFrame({'best_rank': rank.min(), 'weeks': rank.count(), 'rank_sum': rank.sum()})
+    return partials[list(RANKING_PARTIALS)]
+
+def merge_partials(partials, how):
+    '''
+    Merge partial sums of several files into totals
+
+    Args:
+        partials (list(pd.DataFrame)): partial sums indexed by player
+        how (dict): aggregation of every column, MATCH_PARTIALS or RANKING_PARTIALS
+
+    Returns:
+        Dataframe of the totals indexed by player
+    '''
+    assert(isinstance(partials, list))
+    assert(isinstance(how, dict))
+    if not partials:
+        return pd.DataFrame(columns=list(how))
+    return pd.concat(partials).groupby(level=0).agg(how)
+
+def stored_partials(csv_file, compute, tag):
+    '''
+    Load the partial sums of a file from PARTIALS_DIR, computing and storing them when the file changed
+
+    Args:
+        csv_file (str): path of the CSV file
+        compute (callable): function computing the partial sums of the file
+        tag (str): name of the kind of partial sums, part of the stored file name
+
+    Returns:
+        Dataframe of the partial sums
+    '''
+    assert(isinstance(csv_file, str))
+    assert(callable(compute))
+    key = dp.cache_key(csv_file)
+    name = os.path.join(PARTIALS_DIR, dp.cache_name(csv_file) + '.' + tag)
+    partials = dp.load_cached(name, key)
+    if partials is None:
+        partials = compute(csv_file)
+        dp.store_cached(name, key, partials)
+    return partials
+
+def update_totals(files, levels=None, rankings=False):
+    '''
+    Bring the stored totals of certain files up to date
+
+    When the files of the stored totals are unchanged, only the partial sums of
+    the new files are computed and merged into the totals. Otherwise the totals
+    are merged again from the stored partial sums, and only the changed files
+    are read.
+
+    Args:
+        files (str): all the files that matches the string will be used
+        levels (list(str)): tourney levels of the match files to keep, all levels when None
+        rankings (bool): whether the files are ranking files instead of match files
+
+    Returns:
+        Dataframe of the totals indexed by player, see MATCH_PARTIALS and RANKING_PARTIALS
+    '''
+    assert(isinstance(files, str))
+    assert(levels is None or isinstance(levels, list))
+    assert(isinstance(rankings, bool))
+    if not os.path.exists('data'):
+        os.chdir('..')
+    csv_files = sorted(glob.glob(os.path.join(os.getcwd(), files)))
+    if rankings:
+        tag, how, compute = 'rankings', RANKING_PARTIALS, ranking_partials
+    else:
+        tag, how = 'matches-' + ('-'.join(levels) if levels else 'all'), MATCH_PARTIALS
+        compute = lambda csv_file: match_partials(csv_file, levels)
+
+    keys = [dp.cache_key(f) for f in csv_files]
+    totals_name = os.path.join(PARTIALS_DIR, 'totals.' + tag + '.' + hashlib.md5(files.encode()).hexdigest()[:8])
+    stored_keys = dp.cached_key(totals_name)
+    totals = None
+    if stored_keys is not None and all(key in keys for key in stored_keys):
+        totals = dp.load_cached(totals_name, stored_keys)
+    if totals is not None:
+        # Only the new files are read and merged into the stored totals
+        new_files = [f for f, key in zip(csv_files, keys) if key not in stored_keys]
+        if not new_files:
+            return totals
+        partials = [totals] + [stored_partials(f, compute, tag) for f in new_files]
+    else:
+        partials = [stored_partials(f, compute, tag) for f in csv_files]
+    totals = merge_partials(partials, how)
+    dp.store_cached(totals_name, keys, totals)
+    return totals
+
+def scores_from_totals(totals):
+    '''
+    Computes the scores of score_players from the merged match totals
+
+    Args:
+        totals (pd.DataFrame): totals of update_totals for match files
+
+    Returns:
+        Dataframe indexed by player name with the same columns as score_players, ranked by total
+    '''
+    assert(isinstance(totals, pd.DataFrame))
+    scores = pd.DataFrame(index=totals.index)
+    scores['wins'] = totals['wins']
+    scores['losses'] = totals['losses']
+    scores['matches'] = totals['wins'] + totals['losses']
+    won = totals['wins'] > 0
+    serving = sa.score_serving_batch(totals.w_1stWon + totals.l_1stWon, totals.w_2ndWon + totals.l_2ndWon, totals.w_df + totals.l_df)
+    scores['serving'] = np.where(won, serving, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = totals['lose_minutes'] / totals['lose_count'] - totals['win_minutes'] / totals['win_count']
+    scores['match_length'] = rs.match_length_score_batch(diff, float(diff.min()), float(diff.max()))
+    scores['mental'] = totals['mental']
+    scores['mental_score'] = rs.mental_score_batch(totals['mental'], scores['matches'])
+    scores['percentage'] = mt.get_percentage_batch(totals['w_bpSaved'], totals['w_bpFaced'])
+    scores['total'] = scores[['serving', 'match_length', 'mental_score']].mean(axis=1)
+    scores = scores[['matches', 'wins', 'losses', 'serving', 'match_length', 'mental', 'mental_score', 'percentage', 'total']]
+    scores = dp.index_by_name(scores, totals[['name']])
+    return scores.sort_values('total', ascending=False, kind='stable')
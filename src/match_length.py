@@ -1,26 +1,33 @@
+import numpy as np
 import pandas as pd
 import seaborn as sns
-import matplotlib.pyplot as plt
 import data_processing as dp
 import match_length as ml
-import serving_analysis as sa
+import pipeline as pl
+import render as rd
+import tracing as tr
 
-def player_match_length(player, data_other, data_player):
+@tr.traced
+def player_match_length(player, store, big3, data_player):
     '''
     Fetch the matches that a player won and lost to two dataframes
     
+    The lost matches are the ones won by players other than the big three.
+
     Args:
         player (str): name of a player
-        data_other (pd.DataFrame): data of players other than the big three
+        store (MatchStore): index of the data of all matches
+        big3 (list(int)): ids of the big three
         data_player (pd.DataFrame): data winning matches of the player
 
     Returns:
         On dataframe of the lost matches of the player, and oneof the won matches of the player
     '''
     assert(isinstance(player, str))
-    assert(isinstance(data_other, pd.DataFrame))
+    assert(isinstance(big3, list))
     assert(isinstance(data_player, pd.DataFrame))
-    lose_player = data_other[data_other.loser_name.str.contains(player)]
+    lose_player = store.lost(player)
+    lose_player = lose_player[~lose_player['winner_id'].isin(big3)]
     lose_player.insert(0, column = "Result", value = ['Lose']*len(lose_player))
     lose_player.insert(0, column = "Name", value = [player]*len(lose_player))
     win_player = data_player.copy()
@@ -28,45 +35,98 @@ def player_match_length(player, data_other, data_player):
     win_player.insert(0, column = "Name", value = [player]*len(win_player))
     return lose_player, win_player
 
-def main():
-    '''
-    The main function of drawing match length violin plot
+@pl.stage('match_lengths', ['store', 'big3', 'player_data'])
+@tr.traced
+def match_lengths(store, big3, player_data):
     '''
-    all_data = dp.read_gslam_files("data/atp_matches*.csv")
-    data_other = dp.remove_player(["Roger Federer", "Rafael Nadal", "Novak Djokovic"], all_data, 'winner')
-    data_federer = all_data[all_data['winner_name'] == "Roger Federer"].copy()
-    data_federer.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_nadal = all_data[all_data['winner_name'] == "Rafael Nadal"].copy()
-    data_nadal.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_djoker = all_data[all_data['winner_name'] == "Novak Djokovic"].copy()
-    data_djoker.drop([ 'winner_name' ], axis=1, inplace=True)
-
-    data_federer, _ = sa.player_data("Roger Federer", all_data)
-    data_nadal, _ = sa.player_data("Rafael Nadal", all_data)
-    data_djoker, _ = sa.player_data("Novak Djokovic", all_data)
-    # Fetch winning and losing match length for Roger Federer
-    lose_federer, win_federer = ml.player_match_length("Roger Federer", data_other, data_federer)
+    Fetch the lost and won matches of the big three and the rising stars
+    
+    Args:
+        store (MatchStore): index of the data of all matches
+        big3 (list(int)): ids of the big three
+        player_data (dict): won matches and their sum of every player, see player_data
 
-    # Fetch winning and losing match length for Rafael Nadal
-    lose_nadal, win_nadal = ml.player_match_length("Rafael Nadal", data_other, data_nadal)
+    Returns:
+        Dictionary of player name to the lost and won matches of player_match_length
+    '''
+    return {player: ml.player_match_length(player, store, big3, data_player) for player, (data_player, _) in player_data.items()}
 
-    # Fetch winning and losing match length for Novak Djokovic
-    lose_djoker, win_djoker = ml.player_match_length("Novak Djokovic", data_other, data_djoker)
+@pl.stage('other_lengths', ['all_data', 'data_other', 'big3'])
+@tr.traced
+def other_match_lengths(all_data, data_other, big3):
+    '''
+    Fetch the lost and won matches of players other than the big three, up to 400 minutes
+    
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        data_other (pd.DataFrame): data of players other than the big three
+        big3 (list(int)): ids of the big three
 
-    # Fetch winning and losing match length for other players
+    Returns:
+        On dataframe of the lost matches, and one of the won matches
+    '''
     win_other = data_other[data_other['minutes'] <= 400]
     win_other.insert(0, column = "Result", value = ['Win']*len(win_other))
     win_other.insert(0, column = "Name", value = ["Other"]*len(win_other))
-    lose_other = dp.remove_player(["Roger Federer", "Rafael Nadal", "Novak Djokovic"], all_data, 'loser')
+    lose_other = dp.remove_player(big3, all_data, 'loser')
     lose_other = lose_other[lose_other['minutes'] <= 400]
     lose_other.insert(0, column = "Result", value = ['Lose']*len(lose_other))
     lose_other.insert(0, column = "Name", value = ["Other"]*len(lose_other))
+    return lose_other, win_other
 
-    violin_data = pd.concat([win_federer, lose_federer, win_nadal, lose_nadal, win_djoker, lose_djoker, win_other, lose_other])
-    violin_data = violin_data.rename(columns={"minutes": "Minutes"}, errors="raise")
+@pl.stage('violin_data', ['all_data', 'store', 'big3'])
+@tr.traced
+def violin_data(all_data, store, big3):
+    '''
+    Build the input of the violin plot, the winning and losing match lengths of the big three and of other players
+    
+    The matches are the same as the frames of match_lengths and other_lengths,
+    only their minutes are kept with the name and the result as categories.
+
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        store (MatchStore): index of all_data
+        big3 (list(int)): ids of the big three
+
+    Returns:
+        Dataframe with the columns Name and Result (categories) and Minutes (int16)
+    '''
+    minutes = all_data['minutes'].to_numpy(dtype=np.int16)
+    other_winner = ~all_data['winner_id'].isin(big3).to_numpy()
+    other_loser = ~all_data['loser_id'].isin(big3).to_numpy()
+    short = minutes <= 400
+    rows = []
+    for player in pl.BIG3:
+        lost = store.lost_rows(player)
+        rows += [store.won_rows(player), lost[other_winner[lost]]]
+    rows += [np.flatnonzero(other_winner & short), np.flatnonzero(other_loser & short)]
+    names = np.repeat(np.arange(len(pl.BIG3) + 1, dtype=np.int8).repeat(2), [len(r) for r in rows])
+    results = np.repeat(np.tile(np.array([0, 1], dtype=np.int8), len(pl.BIG3) + 1), [len(r) for r in rows])
+    return pd.DataFrame({
+        'Name': pd.Categorical.from_codes(names, pl.BIG3 + ['Other']),
+        'Result': pd.Categorical.from_codes(results, ['Win', 'Lose']),
+        'Minutes': minutes[np.concatenate(rows)],
+        })
+
+@tr.traced
+def report(pipeline):
+    '''
+    Draw the match length violin plot from the shared stages
+    
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
+    '''
+    # Winning and losing match length for the big three and other players
+    data = pipeline.get('violin_data')
     sns.set(style="darkgrid")
-    sns.violinplot(x="Name", y="Minutes", hue="Result", data=violin_data, palette="Pastel1", split=True).set(title='Match Length of Big 3 and Other Players')
-    plt.show()
+    sns.violinplot(x="Name", y="Minutes", hue="Result", data=data, palette="Pastel1", split=True).set(title='Match Length of Big 3 and Other Players')
+    rd.show()
+
+def main():
+    '''
+    The main function of drawing match length violin plot
+    '''
+    report(pl.Pipeline())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
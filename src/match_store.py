@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+class MatchStore:
+    '''
+    Index of the matches of a dataframe by winner, loser and pair of players
+
+    The indexes map a player to the row positions of its matches, they are built
+    once so that the matches of a player are looked up without scanning the data.
+    Players are names, or int ids when the key is 'id'.
+
+    Args:
+        data (pd.DataFrame): data of matches with winner_ and loser_ name or id columns
+        key (str): 'name' or 'id', the player columns to index
+    '''
+    def __init__(self, data, key='name'):
+        assert(isinstance(data, pd.DataFrame))
+        assert(key in ('name', 'id'))
+        self.data = data
+        self.key = key
+        winner, loser = 'winner_' + key, 'loser_' + key
+        self.won_index = data.groupby(winner, sort=False, observed=True).indices
+        self.lost_index = data.groupby(loser, sort=False, observed=True).indices
+        self.pair_index = data.groupby([winner, loser], sort=False, observed=True).indices
+
+    def players(self):
+        '''
+        List the players that won or lost a match
+
+        Returns:
+            The sorted list of names or ids
+        '''
+        return sorted(set(self.won_index) | set(self.lost_index))
+
+    def won_rows(self, player):
+        '''
+        Row positions of the matches won by a player
+
+        Args:
+            player (str or int): name or id of a player
+
+        Returns:
+            Numpy array of row positions in increasing order
+        '''
+        assert(isinstance(player, str if self.key == 'name' else (int, np.integer)))
+        return self.won_index.get(player, np.empty(0, dtype=np.intp))
+
+    def lost_rows(self, player):
+        '''
+        Row positions of the matches lost by a player
+
+        Args:
+            player (str or int): name or id of a player
+
+        Returns:
+            Numpy array of row positions in increasing order
+        '''
+        assert(isinstance(player, str if self.key == 'name' else (int, np.integer)))
+        return self.lost_index.get(player, np.empty(0, dtype=np.intp))
+
+    def head_to_head_rows(self, player, opponent):
+        '''
+        Row positions of the matches between two players
+
+        Args:
+            player (str or int): name or id of a player
+            opponent (str or int): name or id of the other player
+
+        Returns:
+            Numpy array of row positions in increasing order
+        '''
+        assert(isinstance(player, str if self.key == 'name' else (int, np.integer)))
+        assert(isinstance(opponent, str if self.key == 'name' else (int, np.integer)))
+        empty = np.empty(0, dtype=np.intp)
+        rows = np.concatenate([self.pair_index.get((player, opponent), empty), self.pair_index.get((opponent, player), empty)])
+        return np.sort(rows)
+
+    def won(self, player):
+        '''
+        Fetch the matches won by a player
+
+        Args:
+            player (str or int): name or id of a player
+
+        Returns:
+            The dataframe contains the won matches
+        '''
+        return self.data.iloc[self.won_rows(player)]
+
+    def lost(self, player):
+        '''
+        Fetch the matches lost by a player
+
+        Args:
+            player (str or int): name or id of a player
+
+        Returns:
+            The dataframe contains the lost matches
+        '''
+        return self.data.iloc[self.lost_rows(player)]
+
+    def head_to_head(self, player, opponent):
+        '''
+        Fetch the matches between two players
+
+        Args:
+            player (str or int): name or id of a player
+            opponent (str or int): name or id of the other player
+
+        Returns:
+            The dataframe contains the matches won by either player against the other
+        '''
+        return self.data.iloc[self.head_to_head_rows(player, opponent)]
@@ -1,10 +1,14 @@
 import matplotlib.pyplot as plt
 import matplotlib
+import numpy as np
 import pandas as pd
 import data_processing as dp
-import serving_analysis as sa
+import pipeline as pl
+import render as rd
 import mental_toughness as mt
+import tracing as tr
 
+@tr.traced
 def get_percentage(bpS, bpF):
     '''
     Computes the percentage with the given values.
@@ -24,7 +28,58 @@ def get_percentage(bpS, bpF):
         return round((float(bpS) / float(bpF)), 4) * 100
 
 
-def add_mental_points_col(df, names, all_data):
+@tr.traced
+def get_percentage_batch(bpS, bpF):
+    '''
+    Computes the percentages of arrays of values, like get_percentage on each pair.
+    
+    Args:
+        bpS (np.ndarray): break points saved
+        bpF (np.ndarray): break points faced
+
+    Returns:
+        The percentages as a float array, 0 where no break point was faced
+    '''
+    bpS = np.asarray(bpS, dtype='float64')
+    bpF = np.asarray(bpF, dtype='float64')
+    assert(bpS.shape == bpF.shape)
+    ratio = bpS / np.where(bpF == 0, 1, bpF)
+    percentage = np.round(ratio, 4) * 100
+    # np.round and round differ on halfway values, use round there like get_percentage
+    scaled = ratio * 10000
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    percentage[ties] = [round(float(value), 4) * 100 for value in ratio[ties]]
+    return np.where(bpF == 0, 0, percentage)
+
+
+@tr.traced
+def mental_points(all_data):
+    '''
+    Computes the mental points that the winner of each match gets from the score.
+    
+    Half a point per set won 7-x (rounded down per match), 2 points for a five
+    set match and 4 points when the last set was completed x-6 without a tiebreak.
+
+    Args:
+        all_data (pd.DataFrame): The data frame with all data
+
+    Returns:
+        The mental points of every match as a series aligned with all_data.
+    '''
+    assert(isinstance(all_data, pd.DataFrame))
+    scores = dp.parse_scores(all_data['score'])
+    rows = np.arange(len(all_data))
+    last = np.maximum(scores['sets'].astype(int) - 1, 0)
+    completed = ~(scores['retired'] | scores['walkover'] | scores['defaulted'] | scores['abandoned'] | scores['match_tiebreak'])
+    # Sets like 7-5, 7-6 (and 17-15) won by the winner
+    points = (scores['winner_games'] % 10 == 7).sum(axis=1) // 2
+    points += 2 * (scores['sets'] == 5)
+    points += 4 * (completed & (scores['loser_games'][rows, last] == 6) & (scores['tiebreak'][rows, last] == -1))
+    return pd.Series(points.astype('int64'), index=all_data.index)
+
+
+@tr.traced
+def add_mental_points_col(df, names, all_data, players=None):
     '''
     Computes mental points of each score and adds it into another collumn.
     
@@ -32,6 +87,7 @@ def add_mental_points_col(df, names, all_data):
         df (pd.DataFrame): The data frame with the tennis data (to add mental points data)
         names (list(str)): The list of names of all tennis players
         all_data (pd.DataFrame): The data frame with all data
+        players (pd.DataFrame): The player table of player_table giving the names, built from all_data when None
 
     Returns:
         The new dataframe.
@@ -39,32 +95,17 @@ def add_mental_points_col(df, names, all_data):
     assert(isinstance(df, pd.DataFrame))
     assert(isinstance(names, list))
     assert(isinstance(all_data, pd.DataFrame))
-    # Add the new collumn
-    df["mental_score"] = 0
+    assert(players is None or isinstance(players, pd.DataFrame))
+    # Sum the mental points of the won matches of every player id in one pass, then label them by name
+    totals = mental_points(all_data).groupby(all_data['winner_id'].to_numpy()).sum()
+    totals = dp.index_by_name(totals, dp.player_table(all_data) if players is None else players)
 
-    # Iterate through all the names
-    for name in names:
-        # Get the data of that name
-        data_name = all_data[all_data['winner_name'] == name]
-        mental_score = 0
-
-        # For every match score, comput the mental score
-        for _, row in data_name.iterrows():
-            score = row['score']
-            
-            mental_score = int(mental_score + 0.5*score.count("7-"))
-
-            if score.count('-') == 5:
-                mental_score = mental_score + 2
-            
-            if score.rsplit("-",1).pop() == "6":
-                mental_score = mental_score + 4
-        
-                
-        # Add the mental score
-        df.loc[[name],['mental_score']] = mental_score
-    
+    # Add the new collumn with the mental score of the given names
+    df["mental_score"] = 0
+    df.loc[names, "mental_score"] = totals.reindex(names, fill_value=0).to_numpy()
+    return df
 
+@tr.traced
 def annotate_plot(ax, df, names, colors):
     '''
     Annotate the given plot and label the names from the given dataframe.
@@ -82,30 +123,26 @@ def annotate_plot(ax, df, names, colors):
     for name, colour in zip(names, colors):
         plt.scatter(int(df.loc[[name], ["mental_score"]].values[0]), int(df.loc[[name], ["percentage"]].values[0]), s=100, marker='s', color=colour, label=name)
 
-def main():
+@tr.traced
+def report(pipeline):
     '''
-    The main function of drawing plots for mental toughness analysis
+    Draw the plots for mental toughness analysis from the shared stages
+    
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
     '''
-    all_data = dp.read_gslam_files("data/atp_matches*.csv")
-    data_federer = all_data[all_data['winner_name'] == "Roger Federer"].copy()
-    data_federer.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_nadal = all_data[all_data['winner_name'] == "Rafael Nadal"].copy()
-    data_nadal.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_djoker = all_data[all_data['winner_name'] == "Novak Djokovic"].copy()
-    data_djoker.drop([ 'winner_name' ], axis=1, inplace=True)
-
-    data_federer, _ = sa.player_data("Roger Federer", all_data)
-    data_nadal, _ = sa.player_data("Rafael Nadal", all_data)
-    data_djoker, _ = sa.player_data("Novak Djokovic", all_data)
+    all_data = pipeline.get('all_data')
+    players = pipeline.get('players')
 
-    # Group the data by winner name and add all the break points
-    mental_df = all_data[['winner_name', 'w_bpSaved', 'w_bpFaced']].groupby('winner_name').sum()
+    # Group the data by winner and add all the break points, then label the winners by name
+    mental_df = all_data[['winner_id', 'w_bpSaved', 'w_bpFaced']].groupby('winner_id').sum()
+    mental_df = dp.index_by_name(mental_df, players)
 
     # Add a percentage collumn with the breakpoint percentage
-    mental_df['percentage'] = mental_df.apply(lambda x: mt.get_percentage(x['w_bpSaved'], x['w_bpFaced']), axis=1)
+    mental_df['percentage'] = mt.get_percentage_batch(mental_df['w_bpSaved'], mental_df['w_bpFaced'])
 
     # Add a mental points collumn with the mental point scores
-    mt.add_mental_points_col(mental_df, list(mental_df.index), all_data)
+    mt.add_mental_points_col(mental_df, list(mental_df.index), all_data, players)
 
     # Plot the scatterplot
     fig, ax = plt.subplots(figsize=(8,6))
@@ -117,12 +154,18 @@ def main():
 
     plt.legend(prop={'size': 15})
 
-    plt.show()
+    rd.show()
 
     mental_df = mental_df.sort_values('mental_score',ascending=False)
     
     pd.set_option('display.max_rows',525)
     mental_df.head(30)
 
+def main():
+    '''
+    The main function of drawing plots for mental toughness analysis
+    '''
+    report(pl.Pipeline())
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,193 @@
+import importlib
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import data_processing as dp
+from match_store import MatchStore
+from head_to_head import HeadToHead
+import ratings as rt
+
+MATCH_FILES = "data/atp_matches*.csv"
+RANKING_FILES = "data/atp_rankings*.csv"
+
+BIG3 = ["Roger Federer", "Rafael Nadal", "Novak Djokovic"]
+RISING_STARS = ["Alexander Zverev", "Dominic Thiem"]
+
+# Modules of the analyses, each has a report(pipeline) function, in the order they are run
+REPORTS = ['match_length', 'serving_analysis', 'mental_toughness', 'sanky_chart', 'rising_star']
+
+# Registered stages, name to the function and the names of the stages it is computed from
+STAGES = {}
+
+def stage(name, dependencies=()):
+    '''
+    Register a function as the stage of the given name
+
+    The function is called with the values of the dependencies, in order.
+    Analysis modules register their own stages when they are imported, which
+    Pipeline.get does the first time a stage is not registered.
+
+    Args:
+        name (str): name of the stage
+        dependencies (list(str)): names of the stages the function is called with
+
+    Returns:
+        The decorator registering the function
+    '''
+    assert(isinstance(name, str))
+    def register(func):
+        STAGES[name] = (func, list(dependencies))
+        return func
+    return register
+
+class Pipeline:
+    '''
+    Shared intermediate results of the analyses, every stage is computed once on first use
+
+    The files and the snapshot switch are stages themselves, so every other
+    stage is a function of the stages it depends on.
+
+    Args:
+        match_files (str): all the match files that matches the string are read
+        ranking_files (str): all the ranking files that matches the string are read
+        snapshot (bool): whether the tables are opened from memory-mapped snapshots
+    '''
+    def __init__(self, match_files=MATCH_FILES, ranking_files=RANKING_FILES, snapshot=False):
+        assert(isinstance(match_files, str))
+        assert(isinstance(ranking_files, str))
+        assert(isinstance(snapshot, bool))
+        self.results = {'match_files': match_files, 'ranking_files': ranking_files, 'snapshot': snapshot}
+
+    def get(self, name):
+        '''
+        Fetch the value of a stage, computing it and its dependencies when needed
+
+        The modules of REPORTS are imported when the stage is not registered yet,
+        so the stages of the analyses are available without importing them first.
+
+        Args:
+            name (str): name of the stage
+
+        Returns:
+            The value of the stage, shared by all the callers and not to be modified
+        '''
+        assert(isinstance(name, str))
+        if name not in self.results:
+            if name not in STAGES:
+                for module in REPORTS:
+                    importlib.import_module(module)
+            if name not in STAGES:
+                raise KeyError('Unknown stage: ' + name)
+            func, dependencies = STAGES[name]
+            self.results[name] = func(*[self.get(dependency) for dependency in dependencies])
+        return self.results[name]
+
+@stage('all_data', ['match_files', 'snapshot'])
+def gslam_data(match_files, snapshot):
+    '''
+    The grand slam data of read_gslam_files
+    '''
+    return dp.read_gslam_files(match_files, snapshot=snapshot)
+
+@stage('ranking_data', ['ranking_files', 'snapshot'])
+def ranking_data(ranking_files, snapshot):
+    '''
+    The ranking data of read_ranking_files
+    '''
+    return dp.read_ranking_files(ranking_files, snapshot=snapshot)
+
+@stage('players', ['all_data'])
+def players(all_data):
+    '''
+    The table of the players of the grand slam data
+    '''
+    return dp.player_table(all_data)
+
+@stage('big3', ['players'])
+def big3_ids(players):
+    '''
+    The ids of the big three
+    '''
+    return dp.player_ids(players, BIG3)
+
+@stage('store', ['all_data'])
+def store(all_data):
+    '''
+    The index of the grand slam data by player
+    '''
+    return MatchStore(all_data)
+
+@stage('head_to_head', ['all_data', 'players'])
+def head_to_head(all_data, players):
+    '''
+    The head-to-head matrices of the grand slam data
+    '''
+    return HeadToHead(all_data, players)
+
+@stage('ratings', ['match_files'])
+def ratings(match_files):
+    '''
+    The Elo ratings of all the matches, from the checkpoint of update_ratings
+    '''
+    return rt.update_ratings(match_files)
+
+@stage('data_other', ['all_data', 'big3'])
+def data_other(all_data, big3):
+    '''
+    The matches won by players other than the big three
+    '''
+    return dp.remove_player(big3, all_data, 'winner')
+
+def run_report(name, pipeline):
+    '''
+    Run the report of an analysis module on shared stages
+
+    Args:
+        name (str): name of the module, one of REPORTS
+        pipeline (Pipeline): shared stages
+    '''
+    assert(name in REPORTS)
+    assert(isinstance(pipeline, Pipeline))
+    importlib.import_module(name).report(pipeline)
+
+def run_report_process(name, match_files, ranking_files, snapshot):
+    '''
+    Run the report of an analysis module with its own stages, in a worker process
+
+    Args:
+        name (str): name of the module, one of REPORTS
+        match_files (str): all the match files that matches the string are read
+        ranking_files (str): all the ranking files that matches the string are read
+        snapshot (bool): whether the tables are opened from memory-mapped snapshots
+    '''
+    run_report(name, Pipeline(match_files, ranking_files, snapshot))
+
+def run_all(reports=None, workers=1, snapshot=False, match_files=MATCH_FILES, ranking_files=RANKING_FILES):
+    '''
+    Run the reports of the analyses, loading the data once
+
+    With one worker the reports run in order on one pipeline, so every stage is
+    computed once for all of them. With more workers every report runs in its
+    own process, the snapshots are written first so that the processes map the
+    same copy of the tables.
+
+    Args:
+        reports (list(str)): modules to run, all of REPORTS when None
+        workers (int): number of reports run at the same time
+        snapshot (bool): whether the tables are opened from memory-mapped snapshots
+        match_files (str): all the match files that matches the string are read
+        ranking_files (str): all the ranking files that matches the string are read
+    '''
+    reports = REPORTS if reports is None else reports
+    assert(isinstance(reports, list) and all(name in REPORTS for name in reports))
+    assert(isinstance(workers, int) and workers > 0)
+    if workers == 1 or len(reports) < 2:
+        pipeline = Pipeline(match_files, ranking_files, snapshot)
+        for name in reports:
+            run_report(name, pipeline)
+        return
+    if snapshot:
+        pipeline = Pipeline(match_files, ranking_files, snapshot)
+        pipeline.get('all_data')
+        pipeline.get('ranking_data')
+    with ProcessPoolExecutor(max_workers=min(workers, len(reports))) as pool:
+        list(pool.map(run_report_process, reports, repeat(match_files), repeat(ranking_files), repeat(snapshot)))
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+class RankingStore:
+    '''
+    Compact rankings sorted by player and date, for trajectories and rankings on a date
+
+    The rankings are kept as numpy arrays (int32 player ids, int16 ranks,
+    float points and datetime64 dates) sorted by (player, date), with the
+    offsets of every player, plus a second order sorted by (date, rank).
+
+    Args:
+        ranking_data (pd.DataFrame): data read by read_ranking_files
+        names (dict): player id to name, for example the name column of dp.player_table,
+            the names are looked up once for all players
+    '''
+    def __init__(self, ranking_data, names=None):
+        assert(isinstance(ranking_data, pd.DataFrame))
+        assert(names is None or isinstance(names, dict))
+        player = ranking_data['player'].to_numpy(dtype=np.int32)
+        rank = ranking_data['rank'].to_numpy(dtype=np.int16)
+        points = ranking_data['points'].to_numpy(dtype=np.float64, na_value=np.nan)
+        date = pd.to_datetime(ranking_data['ranking_date'].astype(str), format='%Y%m%d').to_numpy().astype('datetime64[D]')
+        order = np.lexsort((date, player))
+        self.player = player[order]
+        self.rank = rank[order]
+        self.points = points[order]
+        self.date = date[order]
+        self.players, self.offsets = np.unique(self.player, return_index=True)
+        self.offsets = np.append(self.offsets, len(self.player))
+        # Second order of the same rows by date then rank
+        self.by_date = np.lexsort((self.rank, self.date))
+        self.dates, self.date_offsets = np.unique(self.date[self.by_date], return_index=True)
+        self.date_offsets = np.append(self.date_offsets, len(self.by_date))
+        names = names or {}
+        self.names = np.array([names.get(p, str(p)) for p in self.players], dtype=object)
+
+    def player_rows(self, player):
+        '''
+        Row positions of the rankings of a player, sorted by date
+
+        Args:
+            player (int): player id
+
+        Returns:
+            A slice of the sorted arrays
+        '''
+        assert(isinstance(player, (int, np.integer)))
+        p = np.searchsorted(self.players, player)
+        if p == len(self.players) or self.players[p] != player:
+            return slice(0, 0)
+        return slice(self.offsets[p], self.offsets[p + 1])
+
+    def frame(self, rows):
+        '''
+        Build a dataframe of some rows of the store
+
+        Args:
+            rows (slice or np.ndarray): row positions
+
+        Returns:
+            Dataframe with the columns ranking_date, rank, player (name) and points
+        '''
+        names = self.names[np.searchsorted(self.players, self.player[rows])]
+        return pd.DataFrame({
+            'ranking_date': pd.to_datetime(self.date[rows]), 'rank': self.rank[rows],
+            'player': names, 'points': self.points[rows],
+            })
+
+    def trajectory(self, player):
+        '''
+        Fetch the ranking history of a player
+
+        Args:
+            player (int): player id
+
+        Returns:
+            Dataframe of the rankings of the player sorted by date
+        '''
+        return self.frame(self.player_rows(player))
+
+    def trajectories(self, players):
+        '''
+        Fetch the ranking history of several players
+
+        Args:
+            players (list(int)): player ids
+
+        Returns:
+            Dataframe of the rankings of the players in the order of the list, each sorted by date
+        '''
+        assert(isinstance(players, list))
+        slices = [self.player_rows(p) for p in players]
+        rows = np.concatenate([np.arange(s.start, s.stop) for s in slices] + [np.empty(0, dtype=int)])
+        return self.frame(rows)
+
+    def on_date(self, date):
+        '''
+        Fetch the rankings of everyone on a date, from the last ranking published on or before the date
+
+        Args:
+            date (int): date as YYYYMMDD
+
+        Returns:
+            Dataframe of the rankings sorted by rank, empty before the first ranking
+        '''
+        assert(isinstance(date, (int, np.integer)))
+        day = np.datetime64(pd.to_datetime(str(date), format='%Y%m%d').date(), 'D')
+        d = np.searchsorted(self.dates, day, side='right') - 1
+        if d < 0:
+            return self.frame(np.empty(0, dtype=int))
+        return self.frame(self.by_date[self.date_offsets[d]:self.date_offsets[d + 1]])
@@ -0,0 +1,289 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import data_processing as dp
+
+RATINGS_DIR = os.path.join(dp.CACHE_DIR, 'ratings')
+
+# Order of the rounds within a tournament, matches of the same date and round are one rating period
+ROUND_ORDER = {
+    'Q1': 0, 'Q2': 1, 'Q3': 2, 'Q4': 3, 'ER': 4, 'RR': 5, 'R128': 6, 'R64': 7,
+    'R32': 8, 'R16': 9, 'QF': 10, 'SF': 11, 'BR': 12, 'F': 13,
+    }
+
+SURFACES = ['Hard', 'Clay', 'Grass', 'Carpet']
+
+# Columns of the match files the ratings are computed from
+RATING_COLUMNS = ['tourney_date', 'round', 'surface', 'winner_id', 'loser_id']
+
+INITIAL_RATING = 1500.0
+
+def k_factor(matches):
+    '''
+    Computes the K factor of players from their number of rated matches
+
+    The factor decreases with experience, 250 / (matches + 5) ** 0.4.
+
+    Args:
+        matches (np.ndarray): number of matches already rated
+
+    Returns:
+        The K factors as a float array
+    '''
+    return 250.0 / (np.asarray(matches, dtype='float64') + 5) ** 0.4
+
+def expected_score(rating, opponent):
+    '''
+    Computes the probability that a player beats an opponent
+
+    Args:
+        rating (np.ndarray): ratings of the players
+        opponent (np.ndarray): ratings of the opponents
+
+    Returns:
+        The probabilities as a float array
+    '''
+    return 1.0 / (1.0 + 10.0 ** ((np.asarray(opponent) - np.asarray(rating)) / 400.0))
+
+class RatingEngine:
+    '''
+    Elo ratings of every player, overall and by surface, kept as arrays
+
+    The state is a sorted array of player ids with the overall ratings, the
+    ratings by surface (players x SURFACES) and the numbers of rated matches.
+    Matches are rated in chronological rating periods (tourney date, then
+    round), all the matches of a period use the ratings from before the period
+    and the changes are added at once, so a period is a few array operations.
+    Players play once per period except in round robins.
+    '''
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.rating = np.empty(0)
+        self.count = np.empty(0, dtype=np.int64)
+        self.surface_rating = np.empty((0, len(SURFACES)))
+        self.surface_count = np.empty((0, len(SURFACES)), dtype=np.int64)
+        self.last_date = 0
+        # Ratings after every rated match, one row per match and player
+        self.log = {col: np.empty(0, dtype=dtype) for col, dtype in [
+            ('tourney_date', np.int32), ('player', np.int32), ('opponent', np.int32), ('won', bool),
+            ('surface', np.int8), ('rating', np.float32), ('surface_rating', np.float32)]}
+
+    def add_players(self, ids):
+        '''
+        Add new players to the state with the initial rating
+
+        Args:
+            ids (np.ndarray): player ids, the known ones are ignored
+        '''
+        ids = np.union1d(self.ids, ids)
+        if len(ids) == len(self.ids):
+            return
+        old = np.searchsorted(ids, self.ids)
+        rating = np.full(len(ids), INITIAL_RATING)
+        rating[old] = self.rating
+        count = np.zeros(len(ids), dtype=np.int64)
+        count[old] = self.count
+        surface_rating = np.full((len(ids), len(SURFACES)), INITIAL_RATING)
+        surface_rating[old] = self.surface_rating
+        surface_count = np.zeros((len(ids), len(SURFACES)), dtype=np.int64)
+        surface_count[old] = self.surface_count
+        self.ids, self.rating, self.count = ids, rating, count
+        self.surface_rating, self.surface_count = surface_rating, surface_count
+
+    def process(self, matches):
+        '''
+        Rate matches played after the last rated date
+
+        Args:
+            matches (pd.DataFrame): data of matches with the columns of RATING_COLUMNS
+
+        Returns:
+            The engine
+        '''
+        assert(isinstance(matches, pd.DataFrame))
+        dates = matches['tourney_date'].to_numpy(dtype=np.int64)
+        assert(len(dates) == 0 or dates.min() > self.last_date)
+        if len(dates) == 0:
+            return self
+        rounds = matches['round'].astype(object).map(ROUND_ORDER).fillna(ROUND_ORDER['RR']).to_numpy(dtype=np.int64)
+        surfaces = pd.Categorical(matches['surface'].astype(object), categories=SURFACES).codes.astype(np.int64)
+        winners = matches['winner_id'].to_numpy(dtype=np.int64)
+        losers = matches['loser_id'].to_numpy(dtype=np.int64)
+        self.add_players(np.concatenate([winners, losers]))
+
+        order = np.lexsort((rounds, dates))
+        dates, surfaces = dates[order], surfaces[order]
+        w = np.searchsorted(self.ids, winners[order])
+        l = np.searchsorted(self.ids, losers[order])
+        period = dates * 100 + rounds[order]
+        bounds = np.flatnonzero(np.diff(period)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(period)]])
+        n = len(order)
+        after_w, after_l = np.empty(n), np.empty(n)
+        surface_w, surface_l = np.full(n, np.nan), np.full(n, np.nan)
+        for start, end in zip(starts, ends):
+            pw, pl = w[start:end], l[start:end]
+            change = 1.0 - expected_score(self.rating[pw], self.rating[pl])
+            kw, kl = k_factor(self.count[pw]), k_factor(self.count[pl])
+            np.add.at(self.rating, pw, kw * change)
+            np.add.at(self.rating, pl, -kl * change)
+            np.add.at(self.count, pw, 1)
+            np.add.at(self.count, pl, 1)
+            after_w[start:end], after_l[start:end] = self.rating[pw], self.rating[pl]
+
+            s = surfaces[start:end]
+            known = s >= 0
+            if known.any():
+                pw, pl, s = pw[known], pl[known], s[known]
+                change = 1.0 - expected_score(self.surface_rating[pw, s], self.surface_rating[pl, s])
+                kw, kl = k_factor(self.surface_count[pw, s]), k_factor(self.surface_count[pl, s])
+                np.add.at(self.surface_rating, (pw, s), kw * change)
+                np.add.at(self.surface_rating, (pl, s), -kl * change)
+                np.add.at(self.surface_count, (pw, s), 1)
+                np.add.at(self.surface_count, (pl, s), 1)
+                rows = start + np.flatnonzero(known)
+                surface_w[rows], surface_l[rows] = self.surface_rating[pw, s], self.surface_rating[pl, s]
+
+        new = {
+            'tourney_date': np.concatenate([dates, dates]), 'player': self.ids[np.concatenate([w, l])],
+            'opponent': self.ids[np.concatenate([l, w])], 'won': np.repeat([True, False], n),
+            'surface': np.concatenate([surfaces, surfaces]), 'rating': np.concatenate([after_w, after_l]),
+            'surface_rating': np.concatenate([surface_w, surface_l]),
+            }
+        # Rows of the winner and the loser of every match next to each other, in the rated order
+        rows = np.arange(2 * n).reshape(2, n).T.ravel()
+        self.log = {col: np.concatenate([self.log[col], new[col][rows].astype(self.log[col].dtype)]) for col in self.log}
+        self.last_date = int(dates.max())
+        return self
+
+    def ratings(self, surface=None):
+        '''
+        Current ratings of every player
+
+        Args:
+            surface (str): one of SURFACES for the surface ratings, the overall ratings when None
+
+        Returns:
+            Series indexed by player id, sorted from the best rating
+        '''
+        assert(surface is None or surface in SURFACES)
+        values = self.rating if surface is None else self.surface_rating[:, SURFACES.index(surface)]
+        return pd.Series(values, index=pd.Index(self.ids, name='id'), name='rating').sort_values(ascending=False, kind='stable')
+
+    def history(self, players=None, surface=None):
+        '''
+        Rating time series of players, the rating after every rated match
+
+        Args:
+            players (list(int)): player ids, all players when None
+            surface (str): one of SURFACES to keep the matches on the surface with the surface rating
+
+        Returns:
+            Dataframe with the columns tourney_date (datetime), player, opponent, won,
+            surface and rating, in the rated order
+        '''
+        assert(players is None or isinstance(players, list))
+        assert(surface is None or surface in SURFACES)
+        keep = np.ones(len(self.log['player']), dtype=bool)
+        if players is not None:
+            keep &= np.isin(self.log['player'], players)
+        if surface is not None:
+            keep &= self.log['surface'] == SURFACES.index(surface)
+        log = {col: values[keep] for col, values in self.log.items()}
+        return pd.DataFrame({
+            'tourney_date': pd.to_datetime(log['tourney_date'].astype(str), format='%Y%m%d'),
+            'player': log['player'], 'opponent': log['opponent'], 'won': log['won'],
+            'surface': pd.Categorical.from_codes(log['surface'].astype(np.int64), categories=SURFACES),
+            'rating': log['rating'] if surface is None else log['surface_rating'],
+            })
+
+    def save(self, name, key=None):
+        '''
+        Write the state and the rating history to a checkpoint file
+
+        The file is written through a temporary file, see dp.replace_file.
+
+        Args:
+            name (str): path of the .npz file
+            key (list): key of the rated files, checked by load
+        '''
+        assert(isinstance(name, str))
+        arrays = {'log_' + col: values for col, values in self.log.items()}
+        def write(temp):
+            # A file object, np.savez would add .npz to the temporary name
+            with open(temp, 'wb') as f:
+                np.savez(f, ids=self.ids, rating=self.rating, count=self.count, surface_rating=self.surface_rating,
+                         surface_count=self.surface_count, last_date=np.array(self.last_date),
+                         key=np.array(json.dumps(key)), **arrays)
+        dp.replace_file(name, write)
+
+    @classmethod
+    def load(cls, name, key=None):
+        '''
+        Read an engine from a checkpoint file written by save
+
+        Args:
+            name (str): path of the .npz file
+            key (list): expected key of the rated files, not checked when None
+
+        Returns:
+            The engine, ValueError is raised when the checkpoint has another key
+        '''
+        assert(isinstance(name, str))
+        engine = cls()
+        with np.load(name) as saved:
+            if key is not None and ('key' not in saved.files or json.loads(str(saved['key'])) != key):
+                raise ValueError('The checkpoint was saved for other files: ' + name)
+            engine.ids, engine.rating, engine.count = saved['ids'], saved['rating'], saved['count']
+            engine.surface_rating, engine.surface_count = saved['surface_rating'], saved['surface_count']
+            engine.last_date = int(saved['last_date'])
+            engine.log = {col: saved['log_' + col] for col in engine.log}
+        return engine
+
+def update_ratings(files="data/atp_matches*.csv", levels=None):
+    '''
+    Bring the checkpointed ratings of certain match files up to date
+
+    When the files of the checkpoint are unchanged and the new files only have
+    matches after the last rated date, only these matches are rated, so a new
+    season extends the checkpoint. Otherwise all the matches are rated again,
+    for example when an older season or a file of other levels is added, or
+    when the checkpoint cannot be read. The checkpoint is written first and its
+    key last, both through temporary files.
+
+    Args:
+        files (str): all the files that matches the string will be read
+        levels (list(str)): tourney levels to rate, all levels when None
+
+    Returns:
+        The RatingEngine of all the matches
+    '''
+    assert(isinstance(files, str))
+    assert(levels is None or isinstance(levels, list))
+    keys = dp.snapshot_key(files)
+    name = os.path.join(RATINGS_DIR, dp.snapshot_name('ratings-' + ('-'.join(levels) if levels else 'all'), files))
+    engine = None
+    stored_keys = dp.cached_key(name)
+    if stored_keys is not None and all(key in keys for key in stored_keys):
+        try:
+            engine = RatingEngine.load(name + '.npz', stored_keys)
+        except Exception:
+            # Missing, truncated or saved for other files, the matches are rated again
+            engine = None
+        if engine is not None:
+            if len(stored_keys) == len(keys):
+                return engine
+            new_files = [key['path'] for key in keys if key not in stored_keys]
+            dates = [dp.read_matches(f, levels=levels, columns=['tourney_date'])['tourney_date'] for f in new_files]
+            if any(len(d) and d.min() <= engine.last_date for d in dates):
+                engine = None
+    if engine is None:
+        engine = RatingEngine()
+    matches = dp.read_matches(files, levels=levels, start=engine.last_date + 1, columns=RATING_COLUMNS)
+    engine.process(matches)
+    os.makedirs(RATINGS_DIR, exist_ok=True)
+    engine.save(name + '.npz', keys)
+    dp.write_json(name + '.json', keys)
+    return engine
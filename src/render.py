@@ -0,0 +1,189 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+import pipeline as pl
+import tracing as tr
+
+# File formats of the exported figures
+FORMATS = ['png', 'svg', 'html']
+
+# Figures kept by show in headless mode with the time to draw them, None when the figures are shown on screen
+collected = None
+
+# Time the last figures were kept, the drawing of the next figure starts there
+shown = None
+
+@tr.traced
+def show(fig=None):
+    '''
+    Show a figure on screen, or keep it for export in headless mode
+
+    A kept figure gets the time since the previous figure was kept, figures
+    kept by the same call share that time.
+
+    Args:
+        fig (go.Figure): plotly figure, the open matplotlib figures when None
+    '''
+    global shown
+    assert(fig is None or isinstance(fig, go.Figure))
+    if collected is None:
+        if fig is None:
+            plt.show()
+        else:
+            fig.show()
+        return
+    figures = [plt.figure(num) for num in plt.get_fignums()] if fig is None else [fig]
+    now = time.perf_counter()
+    collected.extend((figure, (now - shown) / len(figures)) for figure in figures)
+    shown = now
+    if fig is None:
+        plt.close('all')
+
+@contextmanager
+def headless():
+    '''
+    Keep the figures shown inside the block instead of showing them, with the Agg backend
+
+    Returns:
+        The list the shown figures are appended to, with the time to draw every figure in seconds
+    '''
+    global collected, shown
+    backend = plt.get_backend()
+    plt.switch_backend('Agg')
+    collected = []
+    shown = time.perf_counter()
+    try:
+        yield collected
+    finally:
+        collected = None
+        plt.switch_backend(backend)
+
+def figure_title(fig):
+    '''
+    Find the title of a figure
+
+    Args:
+        fig (matplotlib.figure.Figure or go.Figure): the figure
+
+    Returns:
+        The title, or an empty string
+    '''
+    if isinstance(fig, go.Figure):
+        return fig.layout.title.text or ''
+    if fig._suptitle is not None:
+        return fig._suptitle.get_text()
+    return next((ax.get_title() for ax in fig.axes if ax.get_title()), '')
+
+def file_name(report, number, fig):
+    '''
+    Name of the exported file of a figure, without extension
+
+    Args:
+        report (str): name of the report that drew the figure
+        number (int): position of the figure in the report
+        fig (matplotlib.figure.Figure or go.Figure): the figure
+
+    Returns:
+        The file name, the report name, the number and the title
+    '''
+    title = re.sub(r'[^0-9A-Za-z]+', '_', figure_title(fig)).strip('_')
+    return '%s_%02d_%s' % (report, number, title) if title else '%s_%02d' % (report, number)
+
+@tr.traced
+def export_figure(fig, path, fmt):
+    '''
+    Write a figure to a file
+
+    Plotly figures are given as dictionaries so that they are sent to worker
+    processes cheaply, PNG and SVG export of plotly figures needs kaleido.
+
+    Args:
+        fig (matplotlib.figure.Figure or dict): matplotlib figure, or plotly figure as a dictionary
+        path (str): path of the file
+        fmt (str): one of FORMATS
+
+    Returns:
+        The time to write the file in seconds
+    '''
+    assert(isinstance(path, str))
+    assert(fmt in FORMATS)
+    start = time.perf_counter()
+    if isinstance(fig, dict):
+        fig = go.Figure(fig)
+        if fmt == 'html':
+            fig.write_html(path)
+        else:
+            fig.write_image(path, format=fmt)
+    elif fmt == 'html':
+        raise ValueError('matplotlib figures cannot be exported to html')
+    else:
+        fig.savefig(path, format=fmt, bbox_inches='tight')
+    return time.perf_counter() - start
+
+def export_job(fig, path, fmt):
+    '''
+    Write a figure to a file, see export_figure, returning the error instead of raising it
+
+    Returns:
+        The time to write the file in seconds and None, or None and the error message
+    '''
+    try:
+        return export_figure(fig, path, fmt), None
+    except Exception as error:
+        return None, '%s: %s' % (type(error).__name__, ' '.join(str(error).split()))
+
+def render_all(pipeline, reports, out_dir='pics', formats=None, workers=1):
+    '''
+    Run reports without a display and export every figure they show
+
+    The reports run in order on the pipeline, then the figures are written in
+    worker processes. Matplotlib figures are not exported to html, they are
+    written as png instead. A file that cannot be written, for example a
+    plotly png without kaleido, gets its error and the other files are written.
+
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
+        reports (list(str)): modules of the reports to run
+        out_dir (str): directory of the exported files, created when missing
+        formats (list(str)): file formats, from FORMATS, png when None
+        workers (int): number of figures written at the same time
+
+    Returns:
+        List of timings, one dictionary per figure and format with the report,
+        the file, the time to draw the figure (since the previous figure of the
+        report, with the stages computed for it), the time to write the file in
+        seconds (None when it failed) and the error message (None when written)
+    '''
+    formats = ['png'] if formats is None else formats
+    assert(isinstance(reports, list))
+    assert(isinstance(formats, list) and all(fmt in FORMATS for fmt in formats))
+    assert(isinstance(workers, int) and workers > 0)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    timings = []
+    for report in reports:
+        with headless() as figures:
+            pl.run_report(report, pipeline)
+        for number, (fig, draw) in enumerate(figures, 1):
+            name = file_name(report, number, fig)
+            plotly = isinstance(fig, go.Figure)
+            for fmt in formats:
+                fmt = fmt if plotly or fmt != 'html' else 'png'
+                path = os.path.join(out_dir, name + '.' + fmt)
+                if any(job[1] == path for job in jobs):
+                    continue
+                jobs.append((fig.to_dict() if plotly else fig, path, fmt))
+                timings.append({'report': report, 'file': path, 'draw': draw})
+    if workers == 1 or len(jobs) < 2:
+        results = [export_job(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(export_job, *zip(*jobs)))
+    for timing, (write, error) in zip(timings, results):
+        timing['write'] = write
+        timing['error'] = error
+    return timings
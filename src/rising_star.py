@@ -1,12 +1,17 @@
+import numpy as np
 import pandas as pd
 import os
 import plotly.express as px
 import plotly.graph_objects as go
 import data_processing as dp
-import match_length as ml
 import serving_analysis as sa
 import mental_toughness as mt
+from rankings import RankingStore
+import pipeline as pl
+import render as rd
+import tracing as tr
 
+@tr.traced
 def match_len_diff(lose_data, win_data):
     '''
     Computes difference between losing and winning matchlength of a player
@@ -24,6 +29,7 @@ def match_len_diff(lose_data, win_data):
     average_win = win_data["minutes"].mean()
     return average_lose - average_win
 
+@tr.traced
 def match_length_score(ml_diff, smallest_ml, largest_ml):
     '''
     Computes score of match length for a player
@@ -42,45 +48,187 @@ def match_length_score(ml_diff, smallest_ml, largest_ml):
     score = 100*(ml_diff - smallest_ml)/(largest_ml - smallest_ml)
     return score
 
-def main():
+@tr.traced
+def match_length_score_batch(ml_diff, smallest_ml, largest_ml):
     '''
-    The main function of drawing plots for rising star analysis
+    Computes scores of match length for many players at once
+    
+    Args:
+        ml_diff (np.ndarray): Match length difference for every player
+        smallest_ml (float): Smallest match length difference among all players
+        largest_ml (float): Largest match length difference among all players
+
+    Returns:
+        The match length scores as a float array
+    '''
+    assert(isinstance(smallest_ml, float))
+    assert(isinstance(largest_ml, float))
+    ml_diff = np.asarray(ml_diff, dtype='float64')
+    return 100*(ml_diff - smallest_ml)/(largest_ml - smallest_ml)
+
+@tr.traced
+def mental_score_batch(mental, matches):
     '''
-    all_data = dp.read_gslam_files("data/atp_matches*.csv")
-    data_other = dp.remove_player(["Roger Federer", "Rafael Nadal", "Novak Djokovic"], all_data, 'winner')
-    sum_other = data_other.sum()
-    data_federer = all_data[all_data['winner_name'] == "Roger Federer"].copy()
-    data_federer.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_nadal = all_data[all_data['winner_name'] == "Rafael Nadal"].copy()
-    data_nadal.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_djoker = all_data[all_data['winner_name'] == "Novak Djokovic"].copy()
-    data_djoker.drop([ 'winner_name' ], axis=1, inplace=True)
-
-    data_federer, sum_federer = sa.player_data("Roger Federer", all_data)
-    data_nadal, sum_nadal = sa.player_data("Rafael Nadal", all_data)
-    data_djoker, sum_djoker = sa.player_data("Novak Djokovic", all_data)
-
-
-    #rising star match length t Alexander Zverev Dominic Thiem 
-    data_zverev, sum_zverev = sa.player_data("Alexander Zverev", all_data)
-    data_thiem, sum_thiem = sa.player_data("Dominic Thiem", all_data)
+    Computes mental scores for many players at once
+
+    The mental points per match played are scaled to 0-100 between the smallest
+    and the largest rate of the players, like the match length score, so that
+    the score does not grow with the number of matches.
+
+    Args:
+        mental (np.ndarray): Mental points of every player
+        matches (np.ndarray): Matches played by every player
+
+    Returns:
+        The mental scores as a float array, nan for players without matches
+    '''
+    mental = np.asarray(mental, dtype='float64')
+    matches = np.asarray(matches, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = mental / matches
+    return match_length_score_batch(rate, float(np.nanmin(rate)), float(np.nanmax(rate)))
+
+@tr.traced
+def match_length_diffs(all_data, key='name', players=None):
+    '''
+    Computes the difference between losing and winning match length of every player
     
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        key (str): 'name' or 'id', the index of the rows
+        players (pd.DataFrame): player table of player_table giving the names, built from all_data when None
+
+    Returns:
+        Dataframe indexed by player name (or id) with the mean winning and losing match
+        length (win_minutes, lose_minutes), their difference (diff, nan when the
+        player never won or never lost) and the match length score, followed by
+        the smallest and the largest difference
+    '''
+    assert(isinstance(all_data, pd.DataFrame))
+    assert(key in ('name', 'id'))
+    minutes = all_data['minutes'].astype('float64')
+    win = minutes.groupby(all_data['winner_id'].to_numpy()).mean().rename('win_minutes')
+    lose = minutes.groupby(all_data['loser_id'].to_numpy()).mean().rename('lose_minutes')
+    lengths = win.to_frame().join(lose, how='outer')
+    lengths['diff'] = lengths['lose_minutes'] - lengths['win_minutes']
+    smallest_ml = float(lengths['diff'].min())
+    largest_ml = float(lengths['diff'].max())
+    lengths['score'] = match_length_score_batch(lengths['diff'], smallest_ml, largest_ml)
+    if key == 'name':
+        lengths = dp.index_by_name(lengths, dp.player_table(all_data) if players is None else players)
+    return lengths, smallest_ml, largest_ml
+
+@tr.traced
+def score_players(all_data, players=None):
+    '''
+    Computes the serving, match length and mental scores of every player in one batched pass
     
-    lose_federer, win_federer = ml.player_match_length("Roger Federer", data_other, data_federer)
+    The serving score uses the serves of the won matches (see serving_data), the
+    match length score the mean losing minus winning match length and the mental
+    score the mental points per match (see mental_score_batch). The three scores
+    are between 0 and 100 and the total is the mean of the ones that are defined
+    for the player. The matches are grouped by player id and the names are
+    added at the end.
 
-    # Fetch winning and losing match length for Rafael Nadal
-    lose_nadal, win_nadal = ml.player_match_length("Rafael Nadal", data_other, data_nadal)
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        players (pd.DataFrame): player table of player_table giving the names, built from all_data when None
 
-    # Fetch winning and losing match length for Novak Djokovic
-    lose_djoker, win_djoker = ml.player_match_length("Novak Djokovic", data_other, data_djoker)
+    Returns:
+        Dataframe indexed by player name with the columns matches, wins, losses,
+        serving, match_length, mental (points), mental_score, percentage (break
+        points saved) and total, ranked by total
+    '''
+    assert(isinstance(all_data, pd.DataFrame))
+    assert(players is None or isinstance(players, pd.DataFrame))
+    winners = all_data['winner_id'].to_numpy()
+    losers = all_data['loser_id'].to_numpy()
+    lengths, _, _ = match_length_diffs(all_data, key='id')
+    scores = pd.DataFrame(index=lengths.index)
+    scores['wins'] = pd.Series(winners).value_counts().reindex(scores.index, fill_value=0)
+    scores['losses'] = pd.Series(losers).value_counts().reindex(scores.index, fill_value=0)
+    scores['matches'] = scores['wins'] + scores['losses']
+
+    profile = sa.serving_profile(all_data, key='id').reindex(scores.index)
+    scores['serving'] = sa.score_serving_batch(profile.w_1stWon + profile.l_1stWon, profile.w_2ndWon + profile.l_2ndWon, profile.w_df + profile.l_df)
+    scores['match_length'] = lengths['score']
+    scores['mental'] = mt.mental_points(all_data).groupby(winners).sum().reindex(scores.index, fill_value=0)
+    scores['mental_score'] = mental_score_batch(scores['mental'], scores['matches'])
+    break_points = all_data[['w_bpSaved', 'w_bpFaced']].astype('float64').groupby(winners).sum().reindex(scores.index, fill_value=0)
+    scores['percentage'] = mt.get_percentage_batch(break_points['w_bpSaved'], break_points['w_bpFaced'])
+
+    scores['total'] = scores[['serving', 'match_length', 'mental_score']].mean(axis=1)
+    scores = scores[['matches', 'wins', 'losses', 'serving', 'match_length', 'mental', 'mental_score', 'percentage', 'total']]
+    scores = dp.index_by_name(scores, dp.player_table(all_data) if players is None else players)
+    return scores.sort_values('total', ascending=False, kind='stable')
+
+@tr.traced
+def rising_stars(all_data, k=5, min_matches=20, start=None, end=None, exclude=None, scores=None):
+    '''
+    Finds the best scored players of a period
+    
+    Args:
+        all_data (pd.DataFrame): data of all matches, with tourney_date when a period is given
+        k (int): number of players to return
+        min_matches (int): minimum number of matches played in the period
+        start (int): first tourney date of the period as YYYYMMDD
+        end (int): last tourney date of the period as YYYYMMDD
+        exclude (list(str)): players left out, e.g. the big three
+        scores (pd.DataFrame): score_players of all_data, e.g. the 'scores' stage, computed when None or for a period
+
+    Returns:
+        The k best rows of score_players for the period
+    '''
+    assert(isinstance(all_data, pd.DataFrame))
+    assert(isinstance(k, int))
+    assert(isinstance(min_matches, int))
+    assert(exclude is None or isinstance(exclude, list))
+    assert(scores is None or isinstance(scores, pd.DataFrame))
+    if start is not None or end is not None:
+        all_data = all_data[dp.match_filter(all_data, start=start, end=end)]
+        scores = None
+    if scores is None:
+        scores = score_players(all_data)
+    scores = scores[scores['matches'] >= min_matches]
+    if exclude is not None:
+        scores = scores.drop(exclude, errors='ignore')
+    return scores.head(k)
+
+@pl.stage('lengths', ['all_data', 'players'])
+@tr.traced
+def all_match_length_diffs(all_data, players):
+    '''
+    Match length difference of every player and its range, see match_length_diffs
+    '''
+    return match_length_diffs(all_data, players=players)
+
+@pl.stage('scores', ['all_data', 'players'])
+@tr.traced
+def all_scores(all_data, players):
+    '''
+    Scores of every player, see score_players
+    '''
+    return score_players(all_data, players)
+
+@tr.traced
+def report(pipeline):
+    '''
+    Draw the plots for rising star analysis from the shared stages
     
-    win_other = data_other[data_other['minutes'] <= 400]
-    win_other.insert(0, column = "Result", value = ['Win']*len(win_other))
-    win_other.insert(0, column = "Name", value = ["Other"]*len(win_other))
-    lose_other = dp.remove_player(["Roger Federer", "Rafael Nadal", "Novak Djokovic"], all_data, 'loser')
-    lose_other = lose_other[lose_other['minutes'] <= 400]
-    lose_other.insert(0, column = "Result", value = ['Lose']*len(lose_other))
-    lose_other.insert(0, column = "Name", value = ["Other"]*len(lose_other))
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
+    '''
+    all_data = pipeline.get('all_data')
+    players = pipeline.get('players')
+    data_other = pipeline.get('data_other')
+    sum_other = data_other.sum(numeric_only=True)
+
+    # Won and lost matches of the big three and the rising stars Alexander Zverev and Dominic Thiem
+    match_lengths = pipeline.get('match_lengths')
+    lose_federer, win_federer = match_lengths["Roger Federer"]
+    lose_nadal, win_nadal = match_lengths["Rafael Nadal"]
+    lose_djoker, win_djoker = match_lengths["Novak Djokovic"]
+    lose_other, win_other = pipeline.get('other_lengths')
     # Calculate the difference of losing and winning match length for different players
     dif_Federer = match_len_diff(lose_federer, win_federer)
     dif_Nadal = match_len_diff(lose_nadal, win_nadal)
@@ -88,19 +236,8 @@ def main():
     dif_Other = match_len_diff(lose_other, win_other)
 
     print(dif_Federer,dif_Nadal,dif_Djoker,dif_Other)
-    group_win = all_data.groupby(['winner_name'])
-    group_lose = all_data.groupby(['loser_name'])
-    dif = []
-    for name in group_win.groups.keys():
-        player_win = group_win.get_group(name)
-        win_length = player_win['minutes'].mean()
-        player_lose = group_lose.get_group(name)
-        lose_length = player_lose['minutes'].mean()
-        dif.append(lose_length - win_length)
-
-    dif.sort(reverse = True)
-    dif_Largest = max(dif)
-    dif_Least = min(dif)
+    # Match length difference of every player and the range used for the scores
+    lengths, dif_Least, dif_Largest = pipeline.get('lengths')
 
     # Calculate the scores of match length for different players
     score_Federer_length = match_length_score(dif_Federer, dif_Least, dif_Largest)
@@ -110,39 +247,28 @@ def main():
     
     
     
-    # Group the data by winner name and add all the break points
-    mental_df = all_data[['winner_name', 'w_bpSaved', 'w_bpFaced']].groupby('winner_name').sum()
-    # Add a percentage collumn with the breakpoint percentage
-    mental_df['percentage'] = mental_df.apply(lambda x: mt.get_percentage(x['w_bpSaved'], x['w_bpFaced']), axis=1)
-    # Add a mental points collumn with the mental point scores
-    mt.add_mental_points_col(mental_df, list(mental_df.index), all_data)
-
-    mental_df = mental_df.sort_values('mental_score',ascending=False)
-   
-    score_Federer_mental = mental_df.loc['Roger Federer','mental_score']
-    score_Djoker_mental = mental_df.loc['Novak Djokovic','mental_score']
-    score_Nadal_mental = mental_df.loc['Rafael Nadal','mental_score']
-    score_Zverev_mental = mental_df.loc['Alexander Zverev','mental_score']
-    score_Thiem_mental = mental_df.loc['Dominic Thiem','mental_score']
-    mental_df_other = mental_df.drop(['Roger Federer','Novak Djokovic','Rafael Nadal'])
-    score_Other_mental = mental_df_other['mental_score'].mean()
+    # Score every player once, the serving and mental scores are looked up in this table
+    scores = pipeline.get('scores')
+
+    score_Federer_mental = scores.loc['Roger Federer','mental']
+    score_Djoker_mental = scores.loc['Novak Djokovic','mental']
+    score_Nadal_mental = scores.loc['Rafael Nadal','mental']
+    score_Zverev_mental = scores.loc['Alexander Zverev','mental']
+    score_Thiem_mental = scores.loc['Dominic Thiem','mental']
+    scores_other = scores[scores['wins'] > 0].drop(['Roger Federer','Novak Djokovic','Rafael Nadal'])
+    score_Other_mental = scores_other['mental'].mean()
     
     categories = ['Serving Skills','Match Length','Mental Toughness','Serving Skills']
 
     fig = go.Figure()
 
-    ff, fs, fd = sa.serving_data(sum_federer)
-    nf, ns, nd = sa.serving_data(sum_nadal)
-    df, ds, dd = sa.serving_data(sum_djoker) 
     of, os, od = sa.serving_data(sum_other) 
-    tf, ts, td = sa.serving_data(sum_thiem) 
-    zf, zs, zd = sa.serving_data(sum_zverev) 
-    score_Federer_serving = sa.score_serving(ff,fs,fd)
-    score_Nadal_serving = sa.score_serving(nf,ns,nd)
-    score_Djoker_serving = sa.score_serving(df,ds,dd)
+    score_Federer_serving = scores.loc['Roger Federer','serving']
+    score_Nadal_serving = scores.loc['Rafael Nadal','serving']
+    score_Djoker_serving = scores.loc['Novak Djokovic','serving']
     score_Other_serving = sa.score_serving(of,os,od)
-    score_Zverev_serving = sa.score_serving(zf,zs,zd)
-    score_Thiem_serving = sa.score_serving(tf,ts,td)
+    score_Zverev_serving = scores.loc['Alexander Zverev','serving']
+    score_Thiem_serving = scores.loc['Dominic Thiem','serving']
     fig.add_trace(go.Scatterpolar(
         r=[score_Other_serving, score_Other_length,score_Other_mental,score_Other_serving],
         theta=categories,
@@ -168,7 +294,7 @@ def main():
       showlegend=True
   )
 
-    fig.show()
+    rd.show(fig)
     
     categories = ['Serving Skills','Match Length','Mental Toughness','Serving Skills']
 
@@ -210,7 +336,7 @@ def main():
     showlegend=True
   )
 
-    fig.show()
+    rd.show(fig)
     average_Big3_serving = (score_Federer_serving + score_Nadal_serving + score_Djoker_serving)/3
     average_Big3_length = (score_Federer_length + score_Nadal_length + score_Djoker_length)/3
     average_Big3_mental = (score_Federer_mental + score_Nadal_mental + score_Djoker_mental)/3
@@ -249,10 +375,10 @@ def main():
       showlegend=True
   )
 
-    fig.show()
+    rd.show(fig)
     #rising star match length  Alexander Zverev Dominic Thiem 
-    lose_zverev, win_zverev = ml.player_match_length("Alexander Zverev", data_other, data_zverev)
-    lose_thiem, win_thiem = ml.player_match_length("Dominic Thiem", data_other, data_thiem)
+    lose_zverev, win_zverev = match_lengths["Alexander Zverev"]
+    lose_thiem, win_thiem = match_lengths["Dominic Thiem"]
 
     dif_Zverev = match_len_diff(lose_zverev, win_zverev)
     dif_Thiem = match_len_diff(lose_thiem, win_thiem)
@@ -261,6 +387,14 @@ def main():
     score_Thiem_length = match_length_score(dif_Thiem, dif_Least, dif_Largest)
 
     print(score_Zverev_length, score_Thiem_length)
+    # Best scored players other than the big three with at least 20 grand slam matches
+    print(rising_stars(all_data, k=10, min_matches=20, exclude=['Roger Federer','Novak Djokovic','Rafael Nadal'], scores=scores))
+    # Head-to-head of the rising stars against the big three
+    big3 = pipeline.get('big3')
+    print(pipeline.get('head_to_head').versus(dp.player_ids(players, pl.RISING_STARS), big3))
+    # Elo ratings over the matches of all levels of the big three and the rising stars
+    elo = pipeline.get('ratings').ratings().reindex(big3 + dp.player_ids(players, pl.RISING_STARS))
+    print(dp.join_players(elo.to_frame(), players, on='id', columns=['name']))
     
     categories = ['Serving Skills','Match Length','Mental Toughness','Serving Skills']
 
@@ -310,7 +444,7 @@ def main():
   showlegend=True
   )
 
-    fig.show()
+    rd.show(fig)
     categories = ['Serving Skills','Match Length','Mental Toughness','Serving Skills']
 
     fig = go.Figure()
@@ -368,24 +502,14 @@ def main():
   showlegend=True
   )
 
-    fig.show()
-    ranking_data = dp.read_ranking_files("data/atp_rankings*.csv")
-    ranking_data
-    '''
-    100644 Alexander Zverev
-    106233 Dominic Thiem
-    103819 Federer
-    104745 Nadal
-    104925 Djokovic
-    '''
-    ranking = ranking_data[(ranking_data['player'].isin([100644,106233,103819,104745,104925]))]
-    ranking = ranking.sort_values(by=['ranking_date'])
-    ranking['ranking_date'] = pd.to_datetime(ranking['ranking_date'], format='%Y%m%d')
-    ranking = ranking.replace(100644,'Zverev')
-    ranking = ranking.replace(106233,'Thiem')
-    ranking = ranking.replace(103819,'Federer')
-    ranking = ranking.replace(104745,'Nadal')
-    ranking = ranking.replace(104925,'Djokovic')
+    rd.show(fig)
+    ranking_data = pipeline.get('ranking_data')
+    names = {
+        'Rafael Nadal': 'Nadal', 'Dominic Thiem': 'Thiem', 'Alexander Zverev': 'Zverev',
+        'Novak Djokovic': 'Djokovic', 'Roger Federer': 'Federer',
+        }
+    names = dict(zip(dp.player_ids(players, list(names)), names.values()))
+    ranking = RankingStore(ranking_data, names).trajectories(list(names))
     fig = px.line(ranking, x="ranking_date", y="rank", color="player")
  
     fig.update_yaxes(autorange="reversed")
@@ -399,7 +523,13 @@ def main():
         font=dict(size=20)
     ),
     )
-    fig.show()
+    rd.show(fig)
+
+def main():
+    '''
+    The main function of drawing plots for rising star analysis
+    '''
+    report(pl.Pipeline())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import data_processing as dp
+import serving_analysis as sa
+import mental_toughness as mt
+
+# Per match sums every metric is computed from
+COMPONENTS = ['matches', 'wins', 'first', 'second', 'double', 'mental', 'bpSaved', 'bpFaced']
+
+# Components used by every metric
+METRICS = {
+    'matches': ['matches'],
+    'wins': ['wins'],
+    'serving': ['first', 'second', 'double'],
+    'mental': ['mental'],
+    'percentage': ['bpSaved', 'bpFaced'],
+    }
+
+def combine(metric, sums):
+    '''
+    Computes a metric from the sums of its components
+
+    Args:
+        metric (str): name of the metric, a key of METRICS
+        sums (dict): sums of the components as numpy arrays
+
+    Returns:
+        The metric as a float array
+    '''
+    assert(metric in METRICS)
+    assert(isinstance(sums, dict))
+    if metric == 'serving':
+        return sa.score_serving_batch(sums['first'], sums['second'], sums['double'])
+    if metric == 'percentage':
+        return mt.get_percentage_batch(sums['bpSaved'], sums['bpFaced'])
+    return np.asarray(sums[METRICS[metric][0]], dtype='float64')
+
+class RollingMetrics:
+    '''
+    Prefix sums of the per match components of every player, ordered by date
+
+    The matches of each player are stored contiguously and sorted by tourney
+    date, with the cumulative sums of the components, so the sums over any
+    period are the difference of two prefix sums found by binary search. The
+    serving, mental and break point components count the won matches only,
+    like the lifetime scores. The matches are grouped by player id, the
+    players are looked up and the matrices labelled by name.
+
+    Args:
+        all_data (pd.DataFrame): data of matches with a tourney_date column (YYYYMMDD)
+        players (pd.DataFrame): player table of player_table giving the names, built from all_data when None
+    '''
+    def __init__(self, all_data, players=None):
+        assert(isinstance(all_data, pd.DataFrame))
+        assert('tourney_date' in all_data.columns)
+        assert(players is None or isinstance(players, pd.DataFrame))
+        n = len(all_data)
+        dates = all_data['tourney_date'].to_numpy(dtype='int64')
+        stats = all_data[['w_1stWon', 'l_1stWon', 'w_2ndWon', 'l_2ndWon', 'w_df', 'l_df', 'w_bpSaved', 'w_bpFaced']]
+        stats = np.nan_to_num(stats.to_numpy(dtype='float64', na_value=np.nan))
+        won = np.zeros((n, len(COMPONENTS)))
+        won[:, 0] = 1
+        won[:, 1] = 1
+        won[:, 2] = stats[:, 0] + stats[:, 1]
+        won[:, 3] = stats[:, 2] + stats[:, 3]
+        won[:, 4] = stats[:, 4] + stats[:, 5]
+        won[:, 5] = mt.mental_points(all_data).to_numpy()
+        won[:, 6] = stats[:, 6]
+        won[:, 7] = stats[:, 7]
+        lost = np.zeros((n, len(COMPONENTS)))
+        lost[:, 0] = 1
+
+        # One event per player and match, winners first
+        ids = np.concatenate([all_data['winner_id'].to_numpy(dtype='int64'), all_data['loser_id'].to_numpy(dtype='int64')])
+        codes, self.ids = pd.factorize(ids, sort=True)
+        self.player_table = dp.player_table(all_data) if players is None else players
+        self.players = pd.Index(self.player_table['name'].reindex(self.ids).to_numpy(dtype=object), name='name')
+        event_dates = np.concatenate([dates, dates])
+        order = np.lexsort((event_dates, codes))
+        self.codes = codes[order]
+        self.dates = event_dates[order]
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.players) + 1))
+        values = np.concatenate([won, lost])[order]
+        self.prefix = np.vstack([np.zeros((1, len(COMPONENTS))), np.cumsum(values, axis=0)])
+        self.player_index = {player: i for i, player in enumerate(self.players)}
+
+    def sums(self, player, start=None, end=None):
+        '''
+        Sums of the components of a player over a period
+
+        Args:
+            player (str): name of a player
+            start (int): first tourney date of the period as YYYYMMDD, from the first match when None
+            end (int): last tourney date of the period as YYYYMMDD, to the last match when None
+
+        Returns:
+            Dictionary of the sums of every component
+        '''
+        assert(isinstance(player, str))
+        if player not in self.player_index:
+            return {component: 0.0 for component in COMPONENTS}
+        p = self.player_index[player]
+        low, high = self.offsets[p], self.offsets[p + 1]
+        dates = self.dates[low:high]
+        first = low + (0 if start is None else np.searchsorted(dates, start, side='left'))
+        last = low + (len(dates) if end is None else np.searchsorted(dates, end, side='right'))
+        difference = self.prefix[last] - self.prefix[first]
+        return dict(zip(COMPONENTS, difference))
+
+    def metric(self, metric, player, start=None, end=None):
+        '''
+        Computes a metric of a player over a period
+
+        Args:
+            metric (str): 'matches', 'wins', 'serving', 'mental' or 'percentage'
+            player (str): name of a player
+            start (int): first tourney date of the period as YYYYMMDD, from the first match when None
+            end (int): last tourney date of the period as YYYYMMDD, to the last match when None
+
+        Returns:
+            The metric as a float
+        '''
+        assert(metric in METRICS)
+        sums = {key: np.array([value]) for key, value in self.sums(player, start, end).items()}
+        return float(combine(metric, sums)[0])
+
+    def period_prefix(self, bins, components):
+        '''
+        Cumulative sums of components of every player at the end of every period
+
+        Args:
+            bins (np.ndarray): period number of every stored match, increasing with the date
+            components (list(str)): components to sum
+
+        Returns:
+            Dictionary of arrays of shape players x (periods + 1), column p holds the sums of the periods before p
+        '''
+        assert(isinstance(bins, np.ndarray))
+        periods = int(bins.max()) + 1 if len(bins) else 0
+        values = np.diff(self.prefix, axis=0)
+        result = {}
+        for component in components:
+            totals = np.zeros((len(self.players), periods + 1))
+            np.add.at(totals, (self.codes, bins + 1), values[:, COMPONENTS.index(component)])
+            result[component] = np.cumsum(totals, axis=1)
+        return result
+
+    def weekly_matrix(self, metric, weeks=52):
+        '''
+        Computes a metric of every player over the trailing weeks at every week
+
+        Args:
+            metric (str): 'matches', 'wins', 'serving', 'mental' or 'percentage'
+            weeks (int): length of the trailing window in weeks
+
+        Returns:
+            Dataframe of players x weeks (Monday of the week), the metric over the
+            window ending with the week
+        '''
+        assert(metric in METRICS)
+        assert(isinstance(weeks, int) and weeks > 0)
+        days = pd.to_datetime(self.dates.astype(str), format='%Y%m%d').to_numpy().astype('datetime64[D]')
+        # Weeks start on Monday, day 4 of the epoch
+        first = days.min().astype('int64')
+        origin = np.datetime64(int(first - (first - 4) % 7), 'D')
+        bins = (days - origin).astype('int64') // 7
+        prefix = self.period_prefix(bins, METRICS[metric])
+        periods = prefix[METRICS[metric][0]].shape[1] - 1
+        end = np.arange(1, periods + 1)
+        start = np.maximum(end - weeks, 0)
+        sums = {component: values[:, end] - values[:, start] for component, values in prefix.items()}
+        columns = pd.to_datetime(origin + 7 * np.arange(periods))
+        matrix = pd.DataFrame(combine(metric, sums).reshape(len(self.players), periods), index=self.ids, columns=columns)
+        return dp.index_by_name(matrix, self.player_table)
+
+    def season_matrix(self, metric):
+        '''
+        Computes a metric of every player for every season
+
+        Args:
+            metric (str): 'matches', 'wins', 'serving', 'mental' or 'percentage'
+
+        Returns:
+            Dataframe of players x seasons
+        '''
+        assert(metric in METRICS)
+        years = self.dates // 10000
+        first_year = int(years.min())
+        prefix = self.period_prefix(years - first_year, METRICS[metric])
+        sums = {component: np.diff(values, axis=1) for component, values in prefix.items()}
+        seasons = sums[METRICS[metric][0]].shape[1]
+        values = combine(metric, sums).reshape(len(self.players), seasons)
+        matrix = pd.DataFrame(values, index=self.ids, columns=np.arange(first_year, first_year + seasons))
+        return dp.index_by_name(matrix, self.player_table)
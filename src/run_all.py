@@ -0,0 +1,44 @@
+import argparse
+import pipeline as pl
+import render as rd
+import tracing as tr
+
+def main():
+    '''
+    The main function of running the reports of all the analyses on shared stages
+
+    With --out the figures are written to files instead of being shown, the
+    reports draw them with the Agg backend and the files are written in
+    --workers processes. With --trace the calls of the analysis functions are
+    recorded and written to a trace file, and the functions taking the most
+    time are printed.
+    '''
+    parser = argparse.ArgumentParser(description='Run the reports of the analyses, loading the data once')
+    parser.add_argument('reports', nargs='*', help='modules of the reports to run, all by default: ' + ', '.join(pl.REPORTS))
+    parser.add_argument('--workers', type=int, default=1, help='number of reports run at the same time')
+    parser.add_argument('--snapshot', action='store_true', help='open the tables from memory-mapped snapshots')
+    parser.add_argument('--out', help='directory the figures are written to without a display, instead of showing them')
+    parser.add_argument('--format', default='png', help='comma separated formats of the written figures: ' + ', '.join(rd.FORMATS))
+    parser.add_argument('--trace', help='file the calls of the analysis functions are written to, reports in worker processes are not recorded')
+    parser.add_argument('--trace-format', default='chrome', choices=tr.FORMATS, help='format of the trace file')
+    args = parser.parse_args()
+    if args.trace is not None:
+        tr.enable()
+    if args.out is None:
+        pl.run_all(args.reports or None, args.workers, args.snapshot)
+    else:
+        pipeline = pl.Pipeline(snapshot=args.snapshot)
+        timings = rd.render_all(pipeline, args.reports or pl.REPORTS, args.out, args.format.split(','), args.workers)
+        print('%-80s %10s %10s' % ('file', 'draw (s)', 'write (s)'))
+        for timing in timings:
+            if timing['error'] is None:
+                print('%-80s %10.3f %10.3f' % (timing['file'], timing['draw'], timing['write']))
+            else:
+                print('%-80s %10.3f %10s  %s' % (timing['file'], timing['draw'], 'failed', timing['error']))
+    if args.trace is not None:
+        tr.disable()
+        tr.dump(args.trace, args.trace_format)
+        print(tr.summary().head(15).to_string(float_format='%.3f'))
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 import pandas as pd
 import plotly.graph_objects as go
-import data_processing as dp
 import sanky_chart as sc
+import pipeline as pl
+import render as rd
+import tracing as tr
 
+@tr.traced
 def sanky_chart_data(sanky_data):
     '''
     Computes data and layout information for the sanky chart
@@ -68,20 +71,34 @@ def sanky_chart_data(sanky_data):
     )
     return data, layout
 
-def main():
+@tr.traced
+def report(pipeline):
     '''
-    The main function of drawing the sanky chart
+    Draw the sanky chart from the shared stages
+    
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
     '''
-    all_data = dp.read_gslam_files("data/atp_matches*.csv")
+    all_data = pipeline.get('all_data')
     #data taken for Sankey diagram is for top 20 players, so that the visualization is clear
     tgs = len(all_data) #total grand slam matches played
-    sanky_data = all_data.groupby('winner_name',as_index=False).size().sort_values('size', ascending=False).head(20) #data for sanky diagram
+    # Matches won by every player, the row sums of the head-to-head wins
+    h2h = pipeline.get('head_to_head')
+    sanky_data = pd.DataFrame({'winner_name': h2h.names, 'size': h2h.total('wins').to_numpy(dtype='int64')})
+    sanky_data = sanky_data[sanky_data['size'] > 0].sort_values('winner_name').reset_index(drop=True)
+    sanky_data = sanky_data.sort_values('size', ascending=False).head(20) #data for sanky diagram
     sanky_data['total_grand_slams'] = 'Grand slam matches from 2003 to 2020: ' + str(+ tgs)
     sanky_data["winner_name"] = sanky_data["winner_name"] +": "+ (sanky_data['size']).astype(str)
     data, layout = sc.sanky_chart_data(sanky_data)
     fig = go.Figure(data=[data], layout=layout)
 
-    fig.show()
+    rd.show(fig)
+
+def main():
+    '''
+    The main function of drawing the sanky chart
+    '''
+    report(pl.Pipeline())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
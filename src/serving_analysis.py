@@ -1,26 +1,41 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression
 import data_processing as dp
 import serving_analysis as sa
+from match_store import MatchStore
+import pipeline as pl
+import render as rd
+import tracing as tr
 
-def player_data(player, all_data):
+# Serving statistics of the match files, prefixed by w_ and l_
+SERVE_STATS = ['ace', 'df', 'svpt', '1stWon', '2ndWon']
+
+@tr.traced
+def player_data(player, all_data, store=None):
     '''
     Fetch the data that certain player won and calculate the sum of data
     
     Args:
         player (str): name of a player
         all_data (pd.DataFrame): data of all matches
+        store (MatchStore): index of all_data, the data is scanned when None
 
     Returns:
         The data that player won as a dataframe, and sum of data in pandas series format
     '''
     assert(isinstance(player, str))
     assert(isinstance(all_data, pd.DataFrame))
-    data_player = all_data[all_data['winner_name'] == player]
-    sum_player = data_player.sum()
+    assert(store is None or isinstance(store, MatchStore))
+    if store is None:
+        data_player = all_data[all_data['winner_name'] == player]
+    else:
+        data_player = store.won(player)
+    sum_player = data_player.sum(numeric_only=True)
     return data_player, sum_player
 
+@tr.traced
 def player_group_data(all_data, entry):
     '''
     Group the data by given entry and sort the data
@@ -39,6 +54,50 @@ def player_group_data(all_data, entry):
     group_data.sort_values(entry, ascending = False)
     return group_data
 
+@tr.traced
+def serving_profile(all_data, by='winner', key='name', players=None):
+    '''
+    Sum the serving statistics of every player in one aggregation
+    
+    With by='winner' the rows are the winners and the columns are the sums
+    of both the winner (w_) and the loser (l_) statistics of the won matches, so
+    a row can be given to serving_data and serve_percentage like the sums of
+    player_data. With by='player' the rows are all players and the columns are
+    the sums of their own statistics (ace, df, svpt, 1stWon, 2ndWon) over the
+    matches they won and lost. The matches are grouped by player id.
+
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        by (str): 'winner' or 'player'
+        key (str): 'name' or 'id', the index of the rows
+        players (pd.DataFrame): player table of player_table giving the names, built from all_data when None
+
+    Returns:
+        Dataframe with one row per player sorted by name (or id), and one column per statistic
+    '''
+    assert(isinstance(all_data, pd.DataFrame))
+    assert(by in ('winner', 'player'))
+    assert(key in ('name', 'id'))
+    assert(players is None or isinstance(players, pd.DataFrame))
+    winner_stats = ['w_' + stat for stat in SERVE_STATS]
+    loser_stats = ['l_' + stat for stat in SERVE_STATS]
+    # Sum as floats, the compact integer columns of the raw data could overflow
+    winner_values = all_data[winner_stats].to_numpy(dtype='float64', na_value=np.nan)
+    loser_values = all_data[loser_stats].to_numpy(dtype='float64', na_value=np.nan)
+    if by == 'winner':
+        stats = pd.DataFrame(np.hstack([winner_values, loser_values]), columns=winner_stats + loser_stats)
+        ids = all_data['winner_id'].to_numpy()
+    else:
+        # Stack the serve of the winners and of the losers under the same columns
+        stats = pd.DataFrame(np.vstack([winner_values, loser_values]), columns=SERVE_STATS)
+        ids = np.concatenate([all_data['winner_id'].to_numpy(), all_data['loser_id'].to_numpy()])
+    profile = stats.groupby(ids).sum()
+    profile.index.name = 'id'
+    if key == 'id':
+        return profile
+    return dp.index_by_name(profile, dp.player_table(all_data) if players is None else players)
+
+@tr.traced
 def serving_data(player_data):
     '''
     Calculate the number of different servings given the data of a player
@@ -55,6 +114,7 @@ def serving_data(player_data):
     data_d = player_data.w_df + player_data.l_df
     return data_f, data_s, data_d
 
+@tr.traced
 def score_serving(i,j,k):
     '''
     Calculate the serving score of a player given the serving data
@@ -72,6 +132,7 @@ def score_serving(i,j,k):
     score = i/(i+j+k)+0.75*j/(i+j+k)-2*k/(i+j+k)
     return 100*score
 
+@tr.traced
 def serve_percentage(data):
     '''
     Calculate the percentage of aces and double faults given the data of a player
@@ -87,34 +148,81 @@ def serve_percentage(data):
     ace_percentage = data.w_ace/(data.w_1stWon+data.w_2ndWon+data.w_df)*100
     return [df_percentage, ace_percentage]
 
-def main():
+@tr.traced
+def score_serving_batch(i, j, k):
     '''
-    The main function of drawing plots for serving analysis
+    Calculate the serving scores of many players at once, like score_serving on each triple
+    
+    Args:
+        i (np.ndarray): Number of first serve of every player
+        j (np.ndarray): Number of second serve of every player
+        k (np.ndarray): Number of doubel faults of every player
+    Returns:
+        Serving scores as a float array, nan for players without serves
+    '''
+    i = np.asarray(i, dtype='float64')
+    j = np.asarray(j, dtype='float64')
+    k = np.asarray(k, dtype='float64')
+    assert(i.shape == j.shape == k.shape)
+    total = i + j + k
+    score = (i + 0.75*j - 2*k) / np.where(total == 0, 1, total)
+    return np.where(total == 0, np.nan, 100*score)
+
+@tr.traced
+def serve_percentage_batch(data):
+    '''
+    Calculate the percentage of aces and double faults of many players at once
+    
+    Args:
+        data (pd.DataFrame): data of the players, e.g. from serving_profile
+
+    Returns:
+        Arrays of percentages of aces and double faults, nan for players without serves
     '''
-    all_data = dp.read_gslam_files("data/atp_matches*.csv")
-    data_other = dp.remove_player(["Roger Federer", "Rafael Nadal", "Novak Djokovic"], all_data, 'winner')
-    sum_other = data_other.sum()
-    data_federer = all_data[all_data['winner_name'] == "Roger Federer"].copy()
-    data_federer.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_nadal = all_data[all_data['winner_name'] == "Rafael Nadal"].copy()
-    data_nadal.drop([ 'winner_name' ], axis=1, inplace=True)
-    data_djoker = all_data[all_data['winner_name'] == "Novak Djokovic"].copy()
-    data_djoker.drop([ 'winner_name' ], axis=1, inplace=True)
-
-    data_federer, sum_federer = player_data("Roger Federer", all_data)
-    data_nadal, sum_nadal = player_data("Rafael Nadal", all_data)
-    data_djoker, sum_djoker = player_data("Novak Djokovic", all_data)
-
-    # Counting number of ace point played by every winning player
-    ace_winner = player_group_data(all_data, 'w_ace')
-    # Counting number of firstserve played by every winning player
-    firstserve_winner = player_group_data(all_data, 'w_1stWon')
-    # Counting number of secondserve played by every winning player
-    secondserve_winner = player_group_data(all_data, 'w_2ndWon')
-    # Counting number of double faults by every player
-    df_winner = all_data[['winner_name', 'w_df']].groupby('winner_name').sum()
-    df_winner = pd.DataFrame(df_winner)
-    df_winner.head()
+    assert(isinstance(data, pd.DataFrame))
+    total = (data.w_1stWon + data.w_2ndWon + data.w_df).to_numpy(dtype='float64')
+    safe_total = np.where(total == 0, 1, total)
+    df_percentage = np.where(total == 0, np.nan, data.w_df.to_numpy(dtype='float64')/safe_total*100)
+    ace_percentage = np.where(total == 0, np.nan, data.w_ace.to_numpy(dtype='float64')/safe_total*100)
+    return [df_percentage, ace_percentage]
+
+@pl.stage('player_data', ['all_data', 'store'])
+@tr.traced
+def big3_rising_data(all_data, store):
+    '''
+    Fetch the won matches of the big three and the rising stars with their sums
+    
+    Args:
+        all_data (pd.DataFrame): data of all matches
+        store (MatchStore): index of all_data
+
+    Returns:
+        Dictionary of player name to the won matches and their sum of player_data
+    '''
+    return {player: sa.player_data(player, all_data, store) for player in pl.BIG3 + pl.RISING_STARS}
+
+@pl.stage('profile', ['all_data', 'players'])
+@tr.traced
+def winner_profile(all_data, players):
+    '''
+    Sum the serving statistics of every winning player, see serving_profile
+    '''
+    return sa.serving_profile(all_data, players=players)
+
+@tr.traced
+def report(pipeline):
+    '''
+    Draw the plots for serving analysis from the shared stages
+    
+    Args:
+        pipeline (pl.Pipeline): shared stages of the analyses
+    '''
+    # Sum the serving statistics of every winning player
+    profile = pipeline.get('profile')
+    sum_federer = profile.loc["Roger Federer"]
+    sum_nadal = profile.loc["Rafael Nadal"]
+    sum_djoker = profile.loc["Novak Djokovic"]
+    sum_other = profile.drop(["Roger Federer", "Rafael Nadal", "Novak Djokovic"]).sum()
     # Data
     r = [0,1,2,3]
     ff, fs, fd = serving_data(sum_federer)
@@ -149,7 +257,7 @@ def main():
     plt.legend(loc='upper left', bbox_to_anchor=(1,1), ncol=1)
  
     # Show graphic
-    plt.show()
+    rd.show()
 
     fig, axis = plt.subplots(figsize=(15,10))
     # Grid lines, Xticks, Xlabel, Ylabel
@@ -160,12 +268,9 @@ def main():
     axis.set_xlabel('Double faults per Serve Point(%)',fontsize=20, labelpad= 25.0)
     axis.set_ylabel('Aces per Serve Point(%)',fontsize=20, labelpad=25.0)
 
-    ace_data = (ace_winner['w_ace']).values.reshape(-1, 1)
-    df_data = (df_winner['w_df']).values.reshape(-1, 1)
-    firstserve_win = firstserve_winner['w_1stWon'].values.reshape(-1, 1)
-    secondserve_win = secondserve_winner['w_2ndWon'].values.reshape(-1, 1)
-    X = df_data/(firstserve_win+secondserve_win+df_data)*100
-    Y = ace_data/(firstserve_win+secondserve_win+df_data)*100
+    df_percentage, ace_percentage = serve_percentage_batch(profile)
+    X = df_percentage.reshape(-1, 1)
+    Y = ace_percentage.reshape(-1, 1)
 
     linear_regressor_one = LinearRegression()  # create object for the class
     linear_regressor_one.fit(X, Y)  # perform linear regression
@@ -182,7 +287,13 @@ def main():
     plt.scatter (*sa.serve_percentage(sum_djoker), s=200, marker = 's', color='y', label = 'Rafael Nadal')
     plt.legend(prop={'size': 20})
 
-    plt.show()
+    rd.show()
+
+def main():
+    '''
+    The main function of drawing plots for serving analysis
+    '''
+    report(pl.Pipeline())
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,471 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import data_processing as dp
+
+# Columns of the generated files, in the order of the Sackmann files
+MATCH_COLUMNS = list(dp.MATCH_SCHEMA)
+RANKING_COLUMNS = list(dp.RANKING_SCHEMA)
+
+# Players of the analyses, generated with their real ids so that the reports find them,
+# they play every year at a fixed level
+KNOWN_PLAYERS = pd.DataFrame({
+    'id': [103819, 104745, 104925, 100644, 106233],
+    'name': ['Roger Federer', 'Rafael Nadal', 'Novak Djokovic', 'Alexander Zverev', 'Dominic Thiem'],
+    'hand': ['R', 'L', 'R', 'R', 'R'],
+    'ht': [185, 185, 188, 198, 185],
+    'ioc': ['SUI', 'ESP', 'SRB', 'GER', 'AUT'],
+    'birth': pd.to_datetime(['1981-08-08', '1986-06-03', '1987-05-22', '1997-04-20', '1993-09-03']),
+    'level': [3.0, 3.0, 3.0, 2.2, 2.2],
+    })
+
+# Id of the first generated player, above the ids of the Sackmann files
+FIRST_ID = 300001
+
+FIRST_NAMES = [
+    'Adrian', 'Bruno', 'Carlos', 'Daniel', 'Elias', 'Felix', 'Gael', 'Hugo', 'Ivan', 'Jonas',
+    'Karel', 'Lucas', 'Marco', 'Nico', 'Oscar', 'Pablo', 'Quentin', 'Rafael', 'Stefan', 'Tomas',
+    'Ugo', 'Victor', 'Willem', 'Xavier', 'Yannick', 'Zdenek', 'Andrea', 'Benoit', 'Diego', 'Emil',
+    ]
+SYLLABLES = ['an', 'bel', 'cor', 'da', 'el', 'fen', 'gar', 'hol', 'ka', 'lin', 'mar', 'no', 'per', 'ri', 'san', 'to', 'val', 'wen', 'ya', 'zo']
+COUNTRIES = ['ARG', 'AUS', 'AUT', 'BEL', 'BRA', 'CAN', 'CHI', 'CRO', 'CZE', 'ESP', 'FRA', 'GBR', 'GER', 'ITA', 'JPN', 'NED', 'RUS', 'SRB', 'SUI', 'SWE', 'USA']
+
+WEEKS = 52
+
+# Weeks of the grand slams (0 is the first Monday of the year) with their name and surface
+GRAND_SLAMS = {2: ('Australian Open', 'Hard'), 21: ('Roland Garros', 'Clay'), 26: ('Wimbledon', 'Grass'), 34: ('US Open', 'Hard')}
+MASTERS_WEEKS = [9, 11, 14, 17, 19, 31, 32, 40, 44]
+CLAY_WEEKS = range(13, 22)
+GRASS_WEEKS = range(22, 27)
+
+# Draw size and best of by tourney level
+DRAWS = {'G': (128, 5), 'M': (64, 3), 'A': (32, 3)}
+
+ROUNDS = ['R128', 'R64', 'R32', 'R16', 'QF', 'SF', 'F']
+
+# Scores of a set from the side of the set winner and their probabilities, 7-6 is a tiebreak
+SET_SCORES = np.array([(6, 0), (6, 1), (6, 2), (6, 3), (6, 4), (7, 5), (7, 6)])
+SET_PROBABILITIES = [0.04, 0.1, 0.16, 0.2, 0.2, 0.13, 0.17]
+
+# Shares of the matches ended by a retirement and by a walkover
+RETIRED = 0.025
+WALKOVER = 0.004
+
+# Text of a set by (winner games * 8 + loser games) * 14 + tiebreak loser points + 1 (0 without
+# tiebreak), with a leading space for the sets after the first, the last entry is a set not played
+SET_TEXT = [('%d-%d' % (w, l)) + ('(%d)' % (t - 1) if t else '') for w in range(8) for l in range(8) for t in range(14)]
+FIRST_SET_TEXT = np.array(SET_TEXT + [''], dtype=object)
+NEXT_SET_TEXT = np.array([' ' + text for text in SET_TEXT] + [''], dtype=object)
+
+def nullable(values, dtype, mask=None):
+    '''
+    Build a nullable integer array, written as an empty field where missing
+
+    Args:
+        values (np.ndarray): integer values
+        dtype (str): numpy integer type, for example 'int16'
+        mask (np.ndarray): True where the value is missing, no missing values when None
+
+    Returns:
+        pd.arrays.IntegerArray
+    '''
+    mask = np.zeros(len(values), dtype=bool) if mask is None else mask
+    return pd.arrays.IntegerArray(np.where(mask, 0, values).astype(dtype), mask)
+
+def match_scores(best_of, rng):
+    '''
+    Draw the scores of matches, from the side of the winner as in the Sackmann files
+
+    The winner takes the last set, the sets lost by the winner are spread over
+    the other sets and tiebreak sets get the points of the tiebreak loser.
+    Some matches end by a retirement in a set in progress or by a walkover.
+
+    Args:
+        best_of (np.ndarray): 3 or 5 for every match
+        rng (np.random.Generator): random generator
+
+    Returns:
+        Dictionary of numpy arrays: 'score' (score strings), 'winner_games' and
+        'loser_games' (games won in the match), 'walkover' (bool)
+    '''
+    n = len(best_of)
+    need = (best_of + 1) // 2
+    lost = np.where(best_of == 5, rng.choice(3, n, p=[0.45, 0.33, 0.22]), rng.choice(2, n, p=[0.62, 0.38]))
+    played = need + lost
+    slots = np.arange(dp.SCORE_SETS)
+    # The sets lost by the winner are the ones with the smallest random keys before the last set
+    keys = np.where(slots < played[:, None] - 1, rng.random((n, dp.SCORE_SETS)), np.inf)
+    won = keys.argsort(axis=1).argsort(axis=1) >= lost[:, None]
+    outcome = rng.choice(len(SET_SCORES), (n, dp.SCORE_SETS), p=SET_PROBABILITIES)
+    high, low = SET_SCORES[outcome, 0], SET_SCORES[outcome, 1]
+    winner_games = np.where(won, high, low)
+    loser_games = np.where(won, low, high)
+    tiebreak = np.where(rng.random((n, dp.SCORE_SETS)) < 0.8, rng.integers(0, 6, (n, dp.SCORE_SETS)), rng.integers(6, 13, (n, dp.SCORE_SETS)))
+
+    # Retired matches stop in a set in progress
+    retired = rng.random(n) < RETIRED
+    rows = np.flatnonzero(retired)
+    stop = rng.integers(0, played[rows])
+    winner_games[rows, stop] = rng.integers(0, 6, len(rows))
+    loser_games[rows, stop] = rng.integers(0, 6, len(rows))
+    played[rows] = stop + 1
+    unplayed = slots >= played[:, None]
+    winner_games[unplayed] = 0
+    loser_games[unplayed] = 0
+
+    is_tiebreak = winner_games + loser_games == 13
+    codes = (winner_games * 8 + loser_games) * 14 + np.where(is_tiebreak, tiebreak + 1, 0)
+    codes[unplayed] = -1
+    score = FIRST_SET_TEXT[codes[:, 0]]
+    for s in slots[1:]:
+        score = score + NEXT_SET_TEXT[codes[:, s]]
+    score = np.where(retired, score + ' RET', score)
+    walkover = rng.random(n) < WALKOVER
+    score[walkover] = 'W/O'
+    return {
+        'score': score, 'walkover': walkover,
+        'winner_games': np.where(walkover, 0, winner_games.sum(axis=1)),
+        'loser_games': np.where(walkover, 0, loser_games.sum(axis=1)),
+        }
+
+def serve_stats(winner_games, loser_games, walkover, rng):
+    '''
+    Draw the serve statistics and the length of matches consistent with their games
+
+    The service games of both sides add up to the games of the match, the
+    breaks of each side are the games won on the serve of the other, the
+    break points faced are the breaks plus the saved ones, and the points won
+    on serve never exceed the points served in (ace <= 1stWon <= 1stIn <= svpt).
+
+    Args:
+        winner_games (np.ndarray): games won by the winner
+        loser_games (np.ndarray): games won by the loser
+        walkover (np.ndarray): True for the matches not played, their statistics are missing
+        rng (np.random.Generator): random generator
+
+    Returns:
+        Dictionary of the minutes and of the w_ and l_ serve columns as nullable integer arrays
+    '''
+    n = len(winner_games)
+    games = winner_games + loser_games
+    winner_serves_first = rng.random(n) < 0.5
+    serve_games = {'w': np.where(winner_serves_first, (games + 1) // 2, games // 2)}
+    serve_games['l'] = games - serve_games['w']
+    # Service games of the winner lost, the rest of the games of each side are holds or breaks
+    low = np.maximum.reduce([np.zeros(n, dtype=games.dtype), loser_games - serve_games['l'], serve_games['w'] - winner_games])
+    high = np.minimum(serve_games['w'], loser_games)
+    broken = {'w': np.minimum(low + (rng.random(n) ** 3 * (high - low + 1)).astype(games.dtype), high)}
+    broken['l'] = winner_games - serve_games['w'] + broken['w']
+
+    columns = {}
+    points = np.zeros(n, dtype=np.int64)
+    for side, first_won, second_won in [('w', 0.74, 0.53), ('l', 0.68, 0.47)]:
+        svgms, breaks = serve_games[side], broken[side]
+        svpt = np.maximum(rng.poisson(svgms * 5.9 + breaks * 1.5), 4 * svgms)
+        first_in = rng.binomial(svpt, rng.uniform(0.55, 0.68, n))
+        double_faults = rng.binomial(svpt - first_in, rng.uniform(0.05, 0.16, n))
+        first = rng.binomial(first_in, np.clip(rng.normal(first_won, 0.05, n), 0, 1))
+        columns[side + '_ace'] = rng.binomial(first, rng.uniform(0.08, 0.3, n))
+        columns[side + '_df'] = double_faults
+        columns[side + '_svpt'] = svpt
+        columns[side + '_1stIn'] = first_in
+        columns[side + '_1stWon'] = first
+        columns[side + '_2ndWon'] = rng.binomial(svpt - first_in - double_faults, np.clip(rng.normal(second_won, 0.05, n), 0, 1))
+        columns[side + '_SvGms'] = svgms
+        saved = rng.poisson(0.22 * (svgms - breaks) + 0.5 * breaks)
+        columns[side + '_bpSaved'] = saved
+        columns[side + '_bpFaced'] = saved + breaks
+        points += svpt
+    columns['minutes'] = np.round(points * rng.uniform(0.62, 0.76, n))
+    return {col: nullable(values, 'int16', walkover) for col, values in columns.items()}
+
+def player_names(n, rng):
+    '''
+    Draw distinct player names, a first name and a three syllable last name
+
+    Args:
+        n (int): number of names
+        rng (np.random.Generator): random generator
+
+    Returns:
+        Object array of the names
+    '''
+    lasts = len(SYLLABLES) ** 3
+    assert(n <= len(FIRST_NAMES) * lasts)
+    picks = rng.choice(len(FIRST_NAMES) * lasts, n, replace=False)
+    first, last = np.divmod(picks, lasts)
+    syllables = np.array(SYLLABLES, dtype=object)
+    last = syllables[last // 400] + syllables[last // 20 % 20] + syllables[last % 20]
+    return np.array(FIRST_NAMES, dtype=object)[first] + ' ' + np.array([name.capitalize() for name in last], dtype=object)
+
+class SyntheticTour:
+    '''
+    Players, calendar and yearly strength of a synthetic tour, generated week by week
+
+    Every player has a level and a career of 8 to 17 years, the strength of a
+    player is a random walk around the level from year to year. Every week
+    publishes a ranking of the active players by strength and plays events
+    tournaments: the grand slam or masters of the week, if any, and 32 player
+    draws. The entrants are drawn without replacement among the active players,
+    the strongest more often, and matches are won with a logistic probability
+    of the strength difference.
+
+    Args:
+        players (int): number of players, KNOWN_PLAYERS included
+        start (int): first year
+        end (int): last year, inclusive
+        events (int): number of tournaments every week
+        ranked (int): number of players of every weekly ranking
+        seed (int): seed of the random generator
+    '''
+    def __init__(self, players=2000, start=2003, end=2020, events=2, ranked=2000, seed=0):
+        assert(isinstance(players, int) and players > len(KNOWN_PLAYERS))
+        assert(isinstance(start, int) and isinstance(end, int) and start <= end)
+        assert(isinstance(events, int) and events > 0)
+        assert(isinstance(ranked, int) and ranked > 0)
+        self.rng = rng = np.random.default_rng(seed)
+        self.start, self.end, self.events, self.ranked = start, end, events, ranked
+        n = players - len(KNOWN_PLAYERS)
+        debut = np.concatenate([np.full(len(KNOWN_PLAYERS), start), rng.integers(start - 12, end + 1, n)])
+        retire = np.concatenate([np.full(len(KNOWN_PLAYERS), end + 1), debut[len(KNOWN_PLAYERS):] + rng.integers(8, 18, n)])
+        birth = np.datetime64('1970-01-01', 'D') + ((debut[len(KNOWN_PLAYERS):] - 1970 - rng.uniform(17, 21, n)) * 365.25).astype(np.int64)
+        self.players = pd.DataFrame({
+            'id': np.concatenate([KNOWN_PLAYERS['id'], FIRST_ID + np.arange(n)]),
+            'name': np.concatenate([KNOWN_PLAYERS['name'], player_names(n, rng)]),
+            'hand': np.concatenate([KNOWN_PLAYERS['hand'], np.where(rng.random(n) < 0.86, 'R', 'L')]),
+            'ht': np.concatenate([KNOWN_PLAYERS['ht'], np.round(rng.normal(186, 7, n))]).astype(np.int16),
+            'ioc': np.concatenate([KNOWN_PLAYERS['ioc'], rng.choice(COUNTRIES, n)]),
+            'birth': np.concatenate([KNOWN_PLAYERS['birth'].to_numpy().astype('datetime64[D]'), birth]),
+            })
+        years = np.arange(start, end + 1)
+        self.active = (debut[:, None] <= years) & (years < retire[:, None])
+        walk = np.cumsum(rng.normal(0, 0.15, (players, len(years))), axis=1)
+        walk[:len(KNOWN_PLAYERS)] = 0
+        self.skill = np.concatenate([KNOWN_PLAYERS['level'], rng.normal(0, 1, n)])[:, None] + walk
+        entrants = DRAWS['G'][0] + DRAWS['A'][0] * (events - 1)
+        if self.active.sum(axis=0).min() < entrants:
+            raise ValueError('Too few active players for %d tournaments a week, use more players' % events)
+        # Names of the tournaments of every week, the same every year
+        names = player_names(WEEKS * events, rng)
+        self.names = [[names[week * events + slot].split(' ')[1] + ' Open' for slot in range(events)] for week in range(WEEKS)]
+        for week, (name, _) in GRAND_SLAMS.items():
+            self.names[week][0] = name
+        for week in MASTERS_WEEKS:
+            self.names[week][0] = self.names[week][0].replace('Open', 'Masters')
+
+    def calendar(self, week):
+        '''
+        Tournaments of a week
+
+        Args:
+            week (int): week of the year, from 0
+
+        Returns:
+            List of (slot, name, tourney level, surface), the biggest tournament first
+        '''
+        level = 'G' if week in GRAND_SLAMS else 'M' if week in MASTERS_WEEKS else 'A'
+        surface = GRAND_SLAMS[week][1] if week in GRAND_SLAMS else 'Clay' if week in CLAY_WEEKS else 'Grass' if week in GRASS_WEEKS else 'Hard'
+        return [(slot, self.names[week][slot], level if slot == 0 else 'A', surface) for slot in range(self.events)]
+
+    def ranking(self, year, date):
+        '''
+        Ranking of the active players by strength on a date
+
+        Args:
+            year (int): year of the date
+            date (int): date of the ranking as YYYYMMDD
+
+        Returns:
+            Rank and points of every player (0 when unranked) and the ranking as a dataframe
+            with the columns of RANKING_COLUMNS
+        '''
+        y = year - self.start
+        active = np.flatnonzero(self.active[:, y])
+        strength = self.skill[active, y] + self.rng.normal(0, 0.1, len(active))
+        top = active[np.argsort(-strength)[:self.ranked]]
+        rank = np.zeros(len(self.players), dtype=np.int64)
+        rank[top] = np.arange(1, len(top) + 1)
+        points = np.where(rank > 0, np.round(12000 * np.maximum(rank, 1) ** -0.8), 0).astype(np.int64)
+        ranking = pd.DataFrame({
+            'ranking_date': np.full(len(top), date, dtype=np.int32), 'rank': rank[top],
+            'player': self.players['id'].to_numpy()[top], 'points': points[top],
+            })
+        return rank, points, ranking
+
+    def matches(self, year, week, date, rank, points):
+        '''
+        Play the tournaments of a week
+
+        Args:
+            year (int): year of the week
+            week (int): week of the year, from 0
+            date (int): date of the tournaments as YYYYMMDD
+            rank (np.ndarray): rank of every player, 0 when unranked
+            points (np.ndarray): ranking points of every player
+
+        Returns:
+            Dataframe of the matches with the columns of MATCH_COLUMNS, by tournament and round
+        '''
+        rng = self.rng
+        y = year - self.start
+        events = self.calendar(week)
+        draws = np.array([DRAWS[level][0] for _, _, level, _ in events])
+        active = np.flatnonzero(self.active[:, y])
+        # The strongest entrants go to the biggest tournament, the others are shuffled among the 32 player draws
+        key = self.skill[active, y] + rng.gumbel(0, 0.8, len(active))
+        entrants = active[np.argsort(-key)[:draws.sum()]]
+        entrants[draws[0]:] = rng.permutation(entrants[draws[0]:])
+        bounds = np.concatenate([[0], np.cumsum(draws)])
+
+        frames = []
+        for draw in np.unique(draws):
+            slots = np.flatnonzero(draws == draw)
+            players = rng.permuted(np.stack([entrants[bounds[s]:bounds[s + 1]] for s in slots]), axis=1)
+            # The best ranked quarter of the draw is seeded
+            seeds = np.zeros(players.shape, dtype=np.int64)
+            order = np.argsort(np.where(rank[players] > 0, rank[players], len(rank) + 1), axis=1, kind='stable')[:, :draw // 4]
+            np.put_along_axis(seeds, order, np.arange(1, draw // 4 + 1)[None, :], axis=1)
+            seeds[rank[players] == 0] = 0
+            event, rounds, winners, losers, winner_seeds, loser_seeds = [], [], [], [], [], []
+            for r, name in enumerate(ROUNDS[-int(np.log2(draw)):]):
+                a, b = players[:, 0::2], players[:, 1::2]
+                a_wins = rng.random(a.shape) < 1 / (1 + np.exp(-1.1 * (self.skill[a, y] - self.skill[b, y])))
+                event.append(np.repeat(slots, a.shape[1]))
+                rounds.append(np.full(a.size, name, dtype=object))
+                winners.append(np.where(a_wins, a, b).ravel())
+                losers.append(np.where(a_wins, b, a).ravel())
+                winner_seeds.append(np.where(a_wins, seeds[:, 0::2], seeds[:, 1::2]).ravel())
+                loser_seeds.append(np.where(a_wins, seeds[:, 1::2], seeds[:, 0::2]).ravel())
+                players = np.where(a_wins, a, b)
+                seeds = np.where(a_wins, seeds[:, 0::2], seeds[:, 1::2])
+            frames.append(pd.DataFrame({
+                'event': np.concatenate(event), 'round': np.concatenate(rounds),
+                'winner': np.concatenate(winners), 'loser': np.concatenate(losers),
+                'winner_seed': np.concatenate(winner_seeds), 'loser_seed': np.concatenate(loser_seeds),
+                }))
+        draw_matches = pd.concat(frames, ignore_index=True).sort_values('event', kind='stable')
+        event = draw_matches['event'].to_numpy()
+        winner, loser = draw_matches['winner'].to_numpy(), draw_matches['loser'].to_numpy()
+        best_of = np.array([DRAWS[level][1] for _, _, level, _ in events])[event]
+        scores = match_scores(best_of, rng)
+        stats = serve_stats(scores['winner_games'], scores['loser_games'], scores['walkover'], rng)
+
+        day = np.datetime64('%d-%02d-%02d' % (date // 10000, date // 100 % 100, date % 100))
+        table = self.players
+        data = {
+            'tourney_id': np.array(['%d-%02d%02d' % (year, week, slot) for slot, _, _, _ in events], dtype=object)[event],
+            'tourney_name': np.array([name for _, name, _, _ in events], dtype=object)[event],
+            'surface': np.array([surface for _, _, _, surface in events], dtype=object)[event],
+            'draw_size': draws[event],
+            'tourney_level': np.array([level for _, _, level, _ in events], dtype=object)[event],
+            'tourney_date': np.full(len(event), date),
+            'match_num': draw_matches.groupby('event').cumcount().to_numpy() + 1,
+            }
+        for side, players, seeds in [('winner', winner, draw_matches['winner_seed'].to_numpy()), ('loser', loser, draw_matches['loser_seed'].to_numpy())]:
+            data[side + '_id'] = table['id'].to_numpy()[players]
+            data[side + '_seed'] = nullable(seeds, 'int8', seeds == 0)
+            data[side + '_entry'] = np.full(len(event), np.nan, dtype=object)
+            for attribute in dp.PLAYER_ATTRIBUTES:
+                data[side + '_' + attribute] = table[attribute].to_numpy()[players]
+            data[side + '_age'] = np.round((day - table['birth'].to_numpy()[players].astype('datetime64[D]')).astype(np.int64) / 365.25, 1)
+        data['score'] = scores['score']
+        data['best_of'] = best_of
+        data['round'] = draw_matches['round'].to_numpy()
+        data.update(stats)
+        for side, players in [('winner', winner), ('loser', loser)]:
+            data[side + '_rank'] = nullable(rank[players], 'int16', rank[players] == 0)
+            data[side + '_rank_points'] = nullable(points[players], 'int32', rank[players] == 0)
+        return pd.DataFrame(data, columns=MATCH_COLUMNS)
+
+def match_file(out_dir, year):
+    '''
+    Path of the match file of a year, as in the Sackmann files
+    '''
+    return os.path.join(out_dir, 'atp_matches_%d.csv' % year)
+
+def ranking_file(out_dir, year):
+    '''
+    Path of the ranking file of the decade of a year, as in the Sackmann files
+    '''
+    return os.path.join(out_dir, 'atp_rankings_%02ds.csv' % (year % 100 // 10 * 10))
+
+def append_csv(frames, path, written):
+    '''
+    Append dataframes to a CSV file, the first write to a path replaces the file
+
+    Args:
+        frames (list(pd.DataFrame)): data to write, with the same columns
+        path (str): path of the CSV file
+        written (set(str)): paths already written in this run, updated
+    '''
+    assert(isinstance(frames, list))
+    pd.concat(frames, ignore_index=True).to_csv(path, mode='a' if path in written else 'w', header=path not in written, index=False)
+    written.add(path)
+
+def generate(out_dir, players=2000, start=2003, end=2020, events=2, ranked=2000, chunksize=200000, seed=0):
+    '''
+    Write synthetic match and ranking files in the layout of the Sackmann files
+
+    The weeks are generated in order and written every chunksize rows, so the
+    memory use does not grow with the size of the files. Matches go to one
+    file per year and weekly rankings to one file per decade, existing files
+    of the same names are replaced. A year has about 2300 + 1600 * (events - 1)
+    matches.
+
+    Args:
+        out_dir (str): directory of the files, created when missing
+        players (int): number of players, KNOWN_PLAYERS included
+        start (int): first year
+        end (int): last year, inclusive
+        events (int): number of tournaments every week
+        ranked (int): number of players of every weekly ranking
+        chunksize (int): number of rows kept in memory for a file before writing them
+        seed (int): seed of the random generator
+
+    Returns:
+        Dictionary of the numbers of rows written, 'matches' and 'rankings'
+    '''
+    assert(isinstance(out_dir, str))
+    assert(isinstance(chunksize, int) and chunksize > 0)
+    tour = SyntheticTour(players, start, end, events, ranked, seed)
+    os.makedirs(out_dir, exist_ok=True)
+    written = set()
+    pending = {}
+    rows = {'matches': 0, 'rankings': 0}
+    for year in range(start, end + 1):
+        first = np.busday_offset('%d-01-01' % year, 0, roll='forward', weekmask='Mon')
+        for week in range(WEEKS):
+            date = int(str(first + 7 * week).replace('-', ''))
+            rank, points, ranking = tour.ranking(year, date)
+            matches = tour.matches(year, week, date, rank, points)
+            for path, frame, table in [(match_file(out_dir, year), matches, 'matches'), (ranking_file(out_dir, year), ranking, 'rankings')]:
+                pending.setdefault(path, []).append(frame)
+                rows[table] += len(frame)
+            for path in [path for path, frames in pending.items() if sum(len(frame) for frame in frames) >= chunksize]:
+                append_csv(pending.pop(path), path, written)
+        for path in list(pending):
+            append_csv(pending.pop(path), path, written)
+    return rows
+
+def main():
+    '''
+    The main function of writing a synthetic corpus of match and ranking files
+    '''
+    parser = argparse.ArgumentParser(description='Write synthetic match and ranking files in the layout of the Sackmann files')
+    parser.add_argument('out', help='directory of the files')
+    parser.add_argument('--players', type=int, default=2000, help='number of players')
+    parser.add_argument('--start', type=int, default=2003, help='first year')
+    parser.add_argument('--end', type=int, default=2020, help='last year')
+    parser.add_argument('--events', type=int, default=2, help='tournaments every week, about 1600 matches a year each')
+    parser.add_argument('--ranked', type=int, default=2000, help='players of every weekly ranking')
+    parser.add_argument('--chunksize', type=int, default=200000, help='rows kept in memory for a file before writing them')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    rows = generate(args.out, args.players, args.start, args.end, args.events, args.ranked, args.chunksize, args.seed)
+    print('%d matches and %d rankings written to %s in %.1f s' % (rows['matches'], rows['rankings'], args.out, time.perf_counter() - start))
+
+if __name__ == '__main__':
+    main()
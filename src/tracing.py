@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import multiprocessing
+import functools
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+try:
+    import resource
+except ImportError:
+    # Windows, the memory is not measured
+    resource = None
+
+# Whether the calls are recorded, set by enable and disable, or at import by TRACE_ENV
+enabled = False
+
+# Recorded calls, one dictionary per call in the order they ended
+events = []
+
+# Environment variable of the file the trace of a run is written to at exit,
+# with TRACE_FORMAT_ENV set to 'json' or 'chrome' (the default)
+TRACE_ENV = 'TENNIS_TRACE'
+TRACE_FORMAT_ENV = 'TENNIS_TRACE_FORMAT'
+
+FORMATS = ['json', 'chrome']
+
+# Start of the recording, the start of every call is relative to it
+origin = time.perf_counter()
+
+# Open calls of every thread, each with the wall time of the calls made inside it
+local = threading.local()
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def memory():
+    '''
+    Resident memory of the process in MB
+
+    Read from /proc on Linux, elsewhere the peak resident memory is used, and
+    None where neither is available.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / 1e6
+    except OSError:
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def rows(value):
+    '''
+    Number of rows of a value
+
+    Args:
+        value: a dataframe, series or array, or a tuple, list or dictionary of them
+
+    Returns:
+        The number of rows, summed over the tables of a tuple or list, the largest of the
+        columns of a dictionary, None without tables
+    '''
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value) if value.ndim else None
+    if isinstance(value, (tuple, list, dict)):
+        counts = [rows(item) for item in (value.values() if isinstance(value, dict) else value)
+                  if isinstance(item, (pd.DataFrame, pd.Series, np.ndarray))]
+        counts = [count for count in counts if count is not None]
+        if not counts:
+            return None
+        return max(counts) if isinstance(value, dict) else sum(counts)
+    return None
+
+def enable():
+    '''
+    Start recording the calls, the events recorded before are dropped
+    '''
+    global enabled, origin
+    events.clear()
+    origin = time.perf_counter()
+    enabled = True
+
+def disable():
+    '''
+    Stop recording the calls, the recorded events are kept
+    '''
+    global enabled
+    enabled = False
+
+@contextmanager
+def span(name, rows_in=None):
+    '''
+    Record a block of code as one call
+
+    Args:
+        name (str): name of the block in the trace
+        rows_in (int): number of rows the block works on
+
+    Returns:
+        A dictionary where the block can set 'rows_out'
+    '''
+    if not enabled:
+        yield {}
+        return
+    stack = local.__dict__.setdefault('stack', [])
+    info = {'rows_out': None}
+    stack.append(0.0)
+    before = memory()
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        wall = time.perf_counter() - start
+        inner = stack.pop()
+        if stack:
+            stack[-1] += wall
+        after = memory()
+        events.append({
+            'name': name, 'start': start - origin, 'wall': wall, 'self_wall': wall - inner,
+            'rows_in': rows_in, 'rows_out': info['rows_out'], 'memory': None if before is None else after - before,
+            'depth': len(stack), 'pid': os.getpid(), 'tid': threading.get_ident(),
+            })
+
+def traced(func):
+    '''
+    Decorate a function so that its calls are recorded while tracing is enabled
+
+    A call records the wall time, the rows of the largest table argument and
+    of the result and the change of resident memory. While tracing is off the
+    decorated function only checks the enabled flag. Calls made in worker
+    processes are not recorded.
+
+    Args:
+        func (callable): the function
+
+    Returns:
+        The decorated function
+    '''
+    name = func.__module__ + '.' + func.__qualname__
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        counts = [count for count in map(rows, args + tuple(kwargs.values())) if count is not None]
+        with span(name, max(counts) if counts else None) as info:
+            result = func(*args, **kwargs)
+            info['rows_out'] = rows(result)
+        return result
+    return wrapper
+
+def summary():
+    '''
+    Totals of the recorded calls by function
+
+    Returns:
+        Dataframe indexed by name with the number of calls, the total wall time,
+        the time spent outside the recorded calls inside them (self_wall), the rows
+        in and out and the memory change, sorted by self_wall
+    '''
+    columns = ['name', 'wall', 'self_wall', 'rows_in', 'rows_out', 'memory']
+    table = pd.DataFrame(events, columns=columns + ['start', 'depth', 'pid', 'tid'])[columns]
+    grouped = table.astype({'rows_in': 'float64', 'rows_out': 'float64', 'memory': 'float64'}).groupby('name')
+    totals = pd.DataFrame({
+        'calls': grouped.size(), 'wall': grouped['wall'].sum(), 'self_wall': grouped['self_wall'].sum(),
+        'rows_in': grouped['rows_in'].sum(min_count=1), 'rows_out': grouped['rows_out'].sum(min_count=1),
+        'memory': grouped['memory'].sum(min_count=1),
+        })
+    return totals.sort_values('self_wall', ascending=False)
+
+def chrome_trace():
+    '''
+    The recorded calls in the Chrome trace event format, for chrome://tracing or Perfetto
+
+    Returns:
+        Dictionary of the complete events, times in microseconds
+    '''
+    return {'traceEvents': [{
+        'name': event['name'].rsplit('.', 1)[-1], 'cat': event['name'].rsplit('.', 1)[0], 'ph': 'X',
+        'ts': event['start'] * 1e6, 'dur': event['wall'] * 1e6, 'pid': event['pid'], 'tid': event['tid'],
+        'args': {'rows_in': event['rows_in'], 'rows_out': event['rows_out'], 'memory_mb': None if event['memory'] is None else round(event['memory'], 3)},
+        } for event in events], 'displayTimeUnit': 'ms'}
+
+def dump(path, fmt='chrome'):
+    '''
+    Write the recorded calls to a file
+
+    Args:
+        path (str): path of the JSON file
+        fmt (str): 'json' for the list of calls, 'chrome' for the Chrome trace event format
+    '''
+    assert(isinstance(path, str))
+    assert(fmt in FORMATS)
+    with open(path, 'w') as f:
+        json.dump(events if fmt == 'json' else chrome_trace(), f)
+
+@contextmanager
+def tracing(path=None, fmt='chrome'):
+    '''
+    Record the calls made inside the block, and write them to a file at the end
+
+    Args:
+        path (str): path of the JSON file, nothing is written when None
+        fmt (str): one of FORMATS
+
+    Returns:
+        The list of the recorded calls
+    '''
+    assert(fmt in FORMATS)
+    enable()
+    try:
+        yield events
+    finally:
+        disable()
+        if path is not None:
+            dump(path, fmt)
+
+# Worker processes inherit the variable, only the main process writes the trace
+if os.environ.get(TRACE_ENV) and multiprocessing.parent_process() is None:
+    enable()
+    atexit.register(dump, os.environ[TRACE_ENV], os.environ.get(TRACE_FORMAT_ENV, 'chrome'))